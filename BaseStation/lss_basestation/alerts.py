@@ -1,27 +1,96 @@
 """
 alerts.py — Microsoft Teams webhook and SMTP email notifications.
 
-Both channels are fire-and-forget.  A rate limiter prevents the same
-alert type from being sent more often than RATE_LIMIT_SECONDS.
-Actual sends are dispatched on a background thread so they never block
-the receive loop.
+Both channels are fire-and-forget.  A per-key token-bucket rate limiter
+prevents the same alert type from being sent more often than once per
+RATE_LIMIT_SECONDS on average, with an optional small burst allowance.
+Actual sends are queued to a small pool of long-lived worker threads so
+they never block the receive loop.  Alerts queued within BATCH_WINDOW of
+each other are combined into a single Teams card and a single email.
+
+smtplib, the email package and requests are imported on first use so a
+base station with alerts unconfigured does not pay their import cost.
 """
 
+import atexit
+import json
 import logging
-import smtplib
+import queue
 import threading
 import time
-from email.mime.text import MIMEText
-from typing import Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import smtplib
 
 logger = logging.getLogger(__name__)
 
-try:
-    import requests as _requests  # type: ignore
-    _REQUESTS_AVAILABLE = True
-except ImportError:
-    _REQUESTS_AVAILABLE = False
-    logger.warning("requests not installed; Teams alerts disabled")
+# Shared keep-alive session so repeated webhook POSTs reuse one TLS
+# connection instead of handshaking per alert.  Created by _get_session().
+_session = None
+_session_lock = threading.Lock()
+_REQUESTS_AVAILABLE: Optional[bool] = None     # None until first import attempt
+
+# Number of dispatch worker threads and maximum queued (subject, body) pairs.
+# Alerts arriving while the queue is full are dropped and logged.
+_WORKER_COUNT = 2
+_QUEUE_MAXSIZE = 1024
+
+# Seconds a worker keeps collecting further alerts after the first one, so
+# that a simultaneous breach across many nodes produces one notification.
+_BATCH_WINDOW = 0.5
+
+# Upper bound on remembered rate-limit buckets; the least recently sent are
+# evicted first.  Buckets that have refilled completely are indistinguishable
+# from unseen keys and are pruned opportunistically.
+_MAX_RATE_KEYS = 4096
+
+_SMTP_TIMEOUT = 30
+_TEAMS_TIMEOUT = (3.05, 10)     # (connect, read) seconds
+
+
+def _get_session():
+    """Return the shared requests session, importing requests on first use."""
+    global _session, _REQUESTS_AVAILABLE  # pylint: disable=global-statement
+    if _session is not None or _REQUESTS_AVAILABLE is False:
+        return _session
+    with _session_lock:
+        if _session is not None or _REQUESTS_AVAILABLE is False:
+            return _session
+        try:
+            import requests  # type: ignore
+            from requests.adapters import HTTPAdapter  # type: ignore
+            from urllib3.util.retry import Retry  # type: ignore
+        except ImportError:
+            _REQUESTS_AVAILABLE = False
+            logger.warning("requests not installed; Teams alerts disabled")
+            return None
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=4,
+            max_retries=Retry(total=2, backoff_factor=0.2),
+        ))
+        atexit.register(session.close)
+        _REQUESTS_AVAILABLE = True
+        _session = session
+        return _session
+
+
+@lru_cache(maxsize=64)
+def _build_message(subject: str, body: str, sender: str,
+                   to: tuple[str, ...]) -> bytes:
+    """Serialise a plain-text email once; repeat alerts reuse the bytes."""
+    from email import policy
+    from email.message import EmailMessage
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = ", ".join(to)
+    msg.set_content(body)
+    return msg.as_bytes(policy=policy.SMTP)
 
 
 class AlertManager:
@@ -29,10 +98,21 @@ class AlertManager:
     Send threshold-breach notifications via Teams and/or SMTP email.
 
     Rate limiting is applied per alert *key* (a caller-supplied string
-    such as ``"node_3_temperature"``).  The same key will not trigger
-    a notification within *rate_limit_seconds* of the last send.
+    such as ``"node_3_temperature"``) using a token bucket holding up to
+    *burst* tokens and refilling at *refill_rate* tokens per second
+    (default one token per *rate_limit_seconds*).  Each send consumes a
+    token; with the default ``burst=1`` the same key will not trigger a
+    notification within *rate_limit_seconds* of the last send.
     """
 
+    # Constant MessageCard prefix; only the JSON-encoded text and the
+    # closing brace are appended per send.
+    _TEAMS_TEMPLATE = (
+        b'{"@type":"MessageCard",'
+        b'"@context":"http://schema.org/extensions","text":'
+    )
+    _JSON_HEADERS = {"Content-Type": "application/json"}
+
     def __init__(
         self,
         teams_webhook_url: str = "",
@@ -43,6 +123,8 @@ class AlertManager:
         smtp_from: str = "",
         smtp_to: Optional[list[str]] = None,
         rate_limit_seconds: int = 300,
+        burst: int = 1,
+        refill_rate: Optional[float] = None,
     ) -> None:
         self._teams_url = teams_webhook_url
         self._smtp_host = smtp_host
@@ -52,8 +134,27 @@ class AlertManager:
         self._smtp_from = smtp_from
         self._smtp_to: list[str] = smtp_to or []
         self._rate_limit = rate_limit_seconds
-        self._last_sent: dict[str, float] = {}
+        self._burst = float(max(1, burst))
+        if refill_rate is None:
+            refill_rate = (1.0 / rate_limit_seconds if rate_limit_seconds > 0
+                           else float("inf"))
+        self._refill_rate = refill_rate
+        # key → (tokens, monotonic time of last refill), oldest send first.
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
         self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[tuple[str, str]]]" = queue.Queue(
+            maxsize=_QUEUE_MAXSIZE
+        )
+        self._workers: list[threading.Thread] = []
+        for i in range(_WORKER_COUNT):
+            t = threading.Thread(target=self._worker_loop, daemon=True,
+                                 name=f"alert-worker-{i}")
+            t.start()
+            self._workers.append(t)
+        # One persistent SMTP session per dispatching thread; every session
+        # ever opened is also tracked so close_pool() can quit them all.
+        self._smtp_tls = threading.local()
+        self._smtp_conns: list["smtplib.SMTP"] = []
 
     # ------------------------------------------------------------------
     # Public interface
@@ -66,15 +167,34 @@ class AlertManager:
         *key* identifies the alert type for rate-limiting.  Pass an
         empty string to bypass rate limiting.
         """
-        if key and self._is_rate_limited(key):
-            logger.debug("Alert '%s' suppressed by rate limiter", key)
+        if key and self._check_and_record(key):
+            # Suppression is the common case during a sustained breach.
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Alert '%s' suppressed by rate limiter", key)
             return
-        self._record_send(key)
-        threading.Thread(
-            target=self._dispatch_async,
-            args=(subject, body),
-            daemon=True,
-        ).start()
+        try:
+            self._queue.put_nowait((subject, body))
+        except queue.Full:
+            logger.warning("Alert queue full; dropping alert '%s'", subject)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the dispatch workers after draining already-queued alerts."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join(timeout)
+        self._workers = []
+        self.close_pool()
+
+    def close_pool(self) -> None:
+        """QUIT every cached SMTP connection."""
+        with self._lock:
+            conns, self._smtp_conns = self._smtp_conns, []
+        for conn in conns:
+            try:
+                conn.quit()
+            except Exception:  # pylint: disable=broad-except
+                pass
 
     def test_teams(self, message: str = "LSS test alert") -> tuple[bool, str]:
         """
@@ -88,20 +208,65 @@ class AlertManager:
         """
         Send a test email synchronously.
 
-        Returns (success, message).
+        Runs on web request threads, so it uses a one-off SMTP session
+        rather than caching one per thread.  Returns (success, message).
         """
         to = [recipient] if recipient else self._smtp_to
         if not to:
             return False, "No recipients configured"
-        return self._send_email("LSS Test Alert", "This is a test email from the LoRa Sensor Station.", to)
+        return self._send_email(
+            "LSS Test Alert",
+            "This is a test email from the LoRa Sensor Station.",
+            to, pooled=False)
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
-    def _dispatch_async(self, subject: str, body: str) -> None:
+    def _worker_loop(self) -> None:
+        """Pull queued alerts and dispatch them until a ``None`` sentinel."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + _BATCH_WINDOW
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._dispatch_batch(batch)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("Alert dispatch raised: %s", exc)
+            if stop:
+                return
+
+    def _dispatch_batch(self, batch: list[tuple[str, str]]) -> None:
+        """Send one notification per channel covering every alert in *batch*."""
+        if len(batch) == 1:
+            self._dispatch_async(*batch[0])
+            return
+        subject = f"LSS: {len(batch)} alerts"
+        body = "\n\n".join(f"{s}\n{b}" for s, b in batch)
+        teams_text = f"**{subject}**\n\n" + "\n".join(
+            f"- **{s}** — {b}" for s, b in batch
+        )
+        self._dispatch_async(subject, body, teams_text)
+
+    def _dispatch_async(self, subject: str, body: str,
+                        teams_text: Optional[str] = None) -> None:
         """Fire both channels and log any errors."""
-        full_text = f"**{subject}**\n\n{body}"
+        full_text = teams_text or f"**{subject}**\n\n{body}"
         if self._teams_url:
             ok, msg = self._send_teams(full_text)
             if not ok:
@@ -115,49 +280,142 @@ class AlertManager:
         """POST a plain-text card to the Teams incoming webhook."""
         if not self._teams_url:
             return False, "No Teams webhook URL configured"
-        if not _REQUESTS_AVAILABLE:
+        session = _get_session()
+        if session is None:
             return False, "requests not installed"
-        payload = {
-            "@type": "MessageCard",
-            "@context": "http://schema.org/extensions",
-            "text": text,
-        }
+        body = self._TEAMS_TEMPLATE + json.dumps(text).encode() + b"}"
         try:
-            resp = _requests.post(self._teams_url, json=payload, timeout=10)
+            resp = session.post(self._teams_url, data=body,
+                                 headers=self._JSON_HEADERS,
+                                 timeout=_TEAMS_TIMEOUT)
             if resp.status_code == 200:
                 return True, "OK"
             return False, f"HTTP {resp.status_code}: {resp.text[:200]}"
         except Exception as exc:  # pylint: disable=broad-except
             return False, str(exc)
 
-    def _send_email(self, subject: str, body: str,
-                    to: list[str]) -> tuple[bool, str]:
-        """Send a plain-text email via SMTP with STARTTLS."""
+    def _send_email(self, subject: str, body: str, to: list[str],
+                    pooled: bool = True) -> tuple[bool, str]:
+        """
+        Send a plain-text email.
+
+        With *pooled* (the dispatch workers) this thread's cached SMTP
+        session is used; otherwise a session is opened, used and QUIT.
+        """
         if not self._smtp_host:
             return False, "No SMTP host configured"
-        msg = MIMEText(body, "plain")
-        msg["Subject"] = subject
-        msg["From"] = self._smtp_from or self._smtp_username
-        msg["To"] = ", ".join(to)
-        try:
-            with smtplib.SMTP(self._smtp_host, self._smtp_port, timeout=10) as smtp:
-                smtp.ehlo()
-                smtp.starttls()
-                if self._smtp_username:
-                    smtp.login(self._smtp_username, self._smtp_password)
-                smtp.sendmail(msg["From"], to, msg.as_string())
+        sender = self._smtp_from or self._smtp_username
+        data = _build_message(subject, body, sender, tuple(to))
+        if not pooled:
+            try:
+                smtp = self._connect_smtp()
+            except Exception as exc:  # pylint: disable=broad-except
+                return False, str(exc)
+            try:
+                smtp.sendmail(sender, to, data)
+            except Exception as exc:  # pylint: disable=broad-except
+                return False, str(exc)
+            finally:
+                try:
+                    smtp.quit()
+                except Exception:  # pylint: disable=broad-except
+                    smtp.close()
             return True, "OK"
+        try:
+            smtp = self._get_smtp()
+            smtp.sendmail(sender, to, data)
         except Exception as exc:  # pylint: disable=broad-except
+            self._drop_smtp()
             return False, str(exc)
+        try:
+            smtp.rset()
+        except Exception:  # pylint: disable=broad-except
+            self._drop_smtp()
+        return True, "OK"
+
+    def _get_smtp(self) -> "smtplib.SMTP":
+        """
+        Return this thread's SMTP session, reconnecting if it has gone stale.
+
+        A cached session is validated with NOOP before reuse; a fresh one
+        performs EHLO / STARTTLS / EHLO / LOGIN exactly once.
+        """
+        smtp = getattr(self._smtp_tls, "conn", None)
+        if smtp is not None:
+            try:
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except Exception:  # pylint: disable=broad-except
+                pass
+            self._drop_smtp()
+        smtp = self._connect_smtp()
+        self._smtp_tls.conn = smtp
+        with self._lock:
+            self._smtp_conns.append(smtp)
+        return smtp
 
-    def _is_rate_limited(self, key: str) -> bool:
-        """Return True if *key* was sent within the rate-limit window."""
+    def _connect_smtp(self) -> "smtplib.SMTP":
+        """Open a new SMTP session: EHLO / STARTTLS / EHLO / LOGIN."""
+        import smtplib
+        smtp = smtplib.SMTP(self._smtp_host, self._smtp_port,
+                            timeout=_SMTP_TIMEOUT)
+        try:
+            smtp.ehlo()
+            smtp.starttls()
+            smtp.ehlo()
+            if self._smtp_username:
+                smtp.login(self._smtp_username, self._smtp_password)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+
+    def _drop_smtp(self) -> None:
+        """Close and forget this thread's cached SMTP session, if any."""
+        smtp = getattr(self._smtp_tls, "conn", None)
+        if smtp is None:
+            return
+        self._smtp_tls.conn = None
+        with self._lock:
+            if smtp in self._smtp_conns:
+                self._smtp_conns.remove(smtp)
+        try:
+            smtp.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def _check_and_record(self, key: str) -> bool:
+        """
+        Return True if *key* is rate-limited; otherwise take a token.
+
+        The test and the update happen under a single lock acquisition and
+        use the monotonic clock so wall-clock jumps cannot skew the window.
+        """
+        if self._refill_rate == float("inf"):
+            return False
+        now = time.monotonic()
         with self._lock:
-            last = self._last_sent.get(key, 0.0)
-            return (time.time() - last) < self._rate_limit
-
-    def _record_send(self, key: str) -> None:
-        """Record the current time as the last send time for *key*."""
-        if key:
-            with self._lock:
-                self._last_sent[key] = time.time()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = self._burst
+            else:
+                prev_tokens, last_refill = bucket
+                tokens = min(self._burst,
+                             prev_tokens + (now - last_refill) * self._refill_rate)
+            if tokens < 1.0:
+                return True
+            self._buckets[key] = (tokens - 1.0, now)
+            self._buckets.move_to_end(key)
+            self._evict_locked(now)
+            return False
+
+    def _evict_locked(self, now: float) -> None:
+        """Drop refilled and over-capacity buckets (must hold _lock)."""
+        buckets = self._buckets
+        while buckets:
+            oldest_key, (tokens, last_refill) = next(iter(buckets.items()))
+            refilled = (tokens + (now - last_refill) * self._refill_rate
+                        >= self._burst)
+            if len(buckets) <= _MAX_RATE_KEYS and not refilled:
+                break
+            del buckets[oldest_key]
@@ -6,6 +6,9 @@ live in config_storage.py (persisted to data/config.json).
 """
 
 import os
+import sys
+from types import MappingProxyType
+from typing import Optional
 
 # ---------------------------------------------------------------------------
 # File paths
@@ -15,6 +18,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 DB_PATH = os.path.join(DATA_DIR, "sensors.db")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
+NODES_PATH = os.path.join(DATA_DIR, "nodes.json")     # per-node metadata
 LOG_PATH = os.path.join(DATA_DIR, "lss.log")
 
 # ---------------------------------------------------------------------------
@@ -26,6 +30,7 @@ SECRET_KEY = "changeme-lss-secret"
 FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5000
 FLASK_DEBUG = False
+WEB_THREADS = 8                 # waitress worker threads (when installed)
 
 # ---------------------------------------------------------------------------
 # LoRa radio (RFM95W / SX1262)
@@ -81,7 +86,9 @@ CMD_BASE_WELCOME = 0x0C
 CMD_ACK = 0xA0
 CMD_NACK = 0xA1
 
-CMD_NAMES = {
+# Command codes are sparse (0x00–0x0C plus 0xA0/0xA1), so names live in a
+# read-only mapping; use cmd_name() for a formatted fallback.
+CMD_NAMES = MappingProxyType({
     CMD_PING: "CMD_PING",
     CMD_GET_CONFIG: "CMD_GET_CONFIG",
     CMD_SET_INTERVAL: "CMD_SET_INTERVAL",
@@ -97,7 +104,7 @@ CMD_NAMES = {
     CMD_BASE_WELCOME: "CMD_BASE_WELCOME",
     CMD_ACK: "CMD_ACK",
     CMD_NACK: "CMD_NACK",
-}
+})
 
 # ---------------------------------------------------------------------------
 # Value types (SensorValuePacket.type)
@@ -118,39 +125,64 @@ VALUE_MOISTURE = 11
 VALUE_GENERIC = 12
 VALUE_THERMISTOR_TEMPERATURE = 13
 
-VALUE_UNITS = {
-    VALUE_TEMPERATURE: "°C",
-    VALUE_HUMIDITY: "%RH",
-    VALUE_PRESSURE: "hPa",
-    VALUE_LIGHT: "lx",
-    VALUE_VOLTAGE: "V",
-    VALUE_CURRENT: "mA",
-    VALUE_POWER: "mW",
-    VALUE_ENERGY: "Wh",
-    VALUE_GAS_RESISTANCE: "Ω",
-    VALUE_BATTERY: "%",
-    VALUE_SIGNAL_STRENGTH: "dBm",
-    VALUE_MOISTURE: "%",
-    VALUE_GENERIC: "",
-    VALUE_THERMISTOR_TEMPERATURE: "°C",
-}
-
-VALUE_NAMES = {
-    VALUE_TEMPERATURE: "temperature",
-    VALUE_HUMIDITY: "humidity",
-    VALUE_PRESSURE: "pressure",
-    VALUE_LIGHT: "light",
-    VALUE_VOLTAGE: "voltage",
-    VALUE_CURRENT: "current",
-    VALUE_POWER: "power",
-    VALUE_ENERGY: "energy",
-    VALUE_GAS_RESISTANCE: "gas_resistance",
-    VALUE_BATTERY: "battery",
-    VALUE_SIGNAL_STRENGTH: "signal_strength",
-    VALUE_MOISTURE: "moisture",
-    VALUE_GENERIC: "generic",
-    VALUE_THERMISTOR_TEMPERATURE: "thermistor_temperature",
-}
+# Value codes are dense (0..VALUE_THERMISTOR_TEMPERATURE), so units and
+# names are tuples indexed directly by code; use value_unit()/value_name()
+# for bounds-checked access.  Entries are interned so they hash once and
+# compare by identity when used as dict keys or in alert keys.
+VALUE_UNITS = tuple(map(sys.intern, (
+    "°C",        # VALUE_TEMPERATURE
+    "%RH",       # VALUE_HUMIDITY
+    "hPa",       # VALUE_PRESSURE
+    "lx",        # VALUE_LIGHT
+    "V",         # VALUE_VOLTAGE
+    "mA",        # VALUE_CURRENT
+    "mW",        # VALUE_POWER
+    "Wh",        # VALUE_ENERGY
+    "Ω",         # VALUE_GAS_RESISTANCE
+    "%",         # VALUE_BATTERY
+    "dBm",       # VALUE_SIGNAL_STRENGTH
+    "%",         # VALUE_MOISTURE
+    "",          # VALUE_GENERIC
+    "°C",        # VALUE_THERMISTOR_TEMPERATURE
+)))
+
+VALUE_NAMES = tuple(map(sys.intern, (
+    "temperature",             # VALUE_TEMPERATURE
+    "humidity",                # VALUE_HUMIDITY
+    "pressure",                # VALUE_PRESSURE
+    "light",                   # VALUE_LIGHT
+    "voltage",                 # VALUE_VOLTAGE
+    "current",                 # VALUE_CURRENT
+    "power",                   # VALUE_POWER
+    "energy",                  # VALUE_ENERGY
+    "gas_resistance",          # VALUE_GAS_RESISTANCE
+    "battery",                 # VALUE_BATTERY
+    "signal_strength",         # VALUE_SIGNAL_STRENGTH
+    "moisture",                # VALUE_MOISTURE
+    "generic",                 # VALUE_GENERIC
+    "thermistor_temperature",  # VALUE_THERMISTOR_TEMPERATURE
+)))
+
+
+def cmd_name(command_type: int) -> str:
+    """Return the symbolic name of *command_type*, or its hex code."""
+    name = CMD_NAMES.get(command_type)
+    return name if name is not None else f"0x{command_type:02X}"
+
+
+def value_unit(value_type: int) -> str:
+    """Return the display unit for *value_type*, or "" if unknown."""
+    if 0 <= value_type < len(VALUE_UNITS):
+        return VALUE_UNITS[value_type]
+    return ""
+
+
+def value_name(value_type: int) -> Optional[str]:
+    """Return the canonical name for *value_type*, or None if unknown."""
+    if 0 <= value_type < len(VALUE_NAMES):
+        return VALUE_NAMES[value_type]
+    return None
+
 
 # ---------------------------------------------------------------------------
 # Mesh packet types
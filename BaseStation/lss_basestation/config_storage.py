@@ -2,61 +2,148 @@
 config_storage.py — Persistent JSON configuration read/write.
 
 The config file lives at DATA_DIR/config.json and is loaded once at startup.
-Call save() after every mutation to keep it in sync with the in-memory state.
+The frequently-updated "nodes" section is persisted separately in
+DATA_DIR/nodes.json so that node metadata updates rewrite only that file.
+
+Mutations update the in-memory state immediately and mark the affected
+file dirty; a background flusher coalesces bursts of changes into a single
+atomic (temp file + rename) write per file.  Call flush() to force a
+synchronous write.
 """
 
+import atexit
+import contextlib
+import copy
 import json
 import logging
 import os
 import threading
-from typing import Any
+from dataclasses import asdict, dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Mapping, Optional
 
 from . import config as cfg
 
 logger = logging.getLogger(__name__)
 
-# Default configuration written on first run.
-_DEFAULTS: dict[str, Any] = {
-    "network_id": cfg.LORA_NETWORK_ID,
-    "lora": {
-        "frequency": cfg.LORA_FREQUENCY,
-        "spreading_factor": cfg.LORA_SPREADING_FACTOR,
-        "bandwidth": cfg.LORA_BANDWIDTH,
-        "coding_rate": cfg.LORA_CODING_RATE,
-        "tx_power": cfg.LORA_TX_POWER,
-        "preamble_length": cfg.LORA_PREAMBLE_LENGTH,
-    },
-    "mqtt": {
-        "enabled": False,
-        "broker": "localhost",
-        "port": 1883,
-        "username": "",
-        "password": "",
-        "topic_prefix": "lss",
-    },
-    "alerts": {
-        "teams_webhook_url": "",
-        "smtp_host": "",
-        "smtp_port": 587,
-        "smtp_username": "",
-        "smtp_password": "",
-        "smtp_from": "",
-        "smtp_to": [],
-        "rate_limit_seconds": 300,
-    },
-    "nodes": {},   # keyed by str(node_id)
-}
+try:
+    import orjson  # type: ignore
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2
+                            | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, sort_keys=True).encode("utf-8")
+
+    _loads = json.loads
+
+# Seconds the flusher waits after the first change before writing, so that
+# a burst of mutations is persisted with one write.
+_FLUSH_DEBOUNCE = 0.2
+_WRITE_BUFFER_SIZE = 64 * 1024
+
+_EMPTY_NODE: Mapping[str, Any] = MappingProxyType({})
+
+# Top-level sections that get their own lock.
+_SECTIONS = ("lora", "mqtt", "alerts", "nodes")
+
+# ---------------------------------------------------------------------------
+# Default configuration schema (written on first run)
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True, slots=True)
+class LoRaDefaults:
+    """Default radio parameters (``"lora"`` section)."""
+    frequency: float = cfg.LORA_FREQUENCY
+    spreading_factor: int = cfg.LORA_SPREADING_FACTOR
+    bandwidth: int = cfg.LORA_BANDWIDTH
+    coding_rate: int = cfg.LORA_CODING_RATE
+    tx_power: int = cfg.LORA_TX_POWER
+    preamble_length: int = cfg.LORA_PREAMBLE_LENGTH
+
+
+@dataclass(frozen=True, slots=True)
+class MQTTDefaults:
+    """Default broker settings (``"mqtt"`` section)."""
+    enabled: bool = False
+    broker: str = "localhost"
+    port: int = 1883
+    username: str = ""
+    password: str = ""
+    topic_prefix: str = "lss"
+    per_value_topics: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class AlertDefaults:
+    """Default notification settings (``"alerts"`` section)."""
+    teams_webhook_url: str = ""
+    smtp_host: str = ""
+    smtp_port: int = 587
+    smtp_username: str = ""
+    smtp_password: str = ""
+    smtp_from: str = ""
+    smtp_to: list[str] = field(default_factory=list)
+    rate_limit_seconds: int = 300
+    rate_limit_burst: int = 1
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigDefaults:
+    """Top-level default configuration."""
+    network_id: int = cfg.LORA_NETWORK_ID
+    lora: LoRaDefaults = field(default_factory=LoRaDefaults)
+    mqtt: MQTTDefaults = field(default_factory=MQTTDefaults)
+    alerts: AlertDefaults = field(default_factory=AlertDefaults)
+    nodes: dict[str, Any] = field(default_factory=dict)   # keyed by str(node_id)
+
+
+# Immutable template; asdict() builds a fresh, independent dict each call.
+_DEFAULTS = ConfigDefaults()
 
 
 class ConfigStorage:
-    """Thread-safe persistent configuration backed by a JSON file."""
+    """Thread-safe persistent configuration backed by two JSON files."""
+
+    def __init__(self, path: str = cfg.CONFIG_PATH,
+                 nodes_path: Optional[str] = None) -> None:
+        """
+        Initialise and load config from *path*, creating it if absent.
 
-    def __init__(self, path: str = cfg.CONFIG_PATH) -> None:
-        """Initialise and load config from *path*, creating it if absent."""
+        Node metadata lives in *nodes_path*, which defaults to a
+        ``nodes.json`` alongside *path*.
+        """
         self._path = path
-        self._lock = threading.Lock()
+        self._nodes_path = nodes_path or os.path.join(
+            os.path.dirname(path), os.path.basename(cfg.NODES_PATH)
+        )
+        # One lock per well-known section so that, e.g., node metadata
+        # updates never block alert-config reads.  Any other top-level key
+        # is guarded by _struct_lock.  Whole-config operations take every
+        # lock in _all_locked()'s fixed order.
+        self._locks = {s: threading.Lock() for s in _SECTIONS}
+        self._struct_lock = threading.Lock()
+        self._write_lock = threading.Lock()     # serialises file writers
         self._data: dict[str, Any] = {}
+        # Integer-keyed mirror of self._data["nodes"] (which is keyed by
+        # str(node_id) on disk) so get_node() needs no str() conversion.
+        self._nodes_by_int: dict[int, dict[str, Any]] = {}
+        self._node_listeners: list[Callable[[], None]] = []
+        self._dirty_main = False
+        self._dirty_nodes = False
+        self._last_serialized: dict[str, bytes] = {}   # path → bytes on disk
+        self._closed = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()      # cuts the debounce short on close
         self._load()
+        self.flush()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True,
+                                         name="config-flusher")
+        self._flusher.start()
+        atexit.register(self.close)
 
     # ------------------------------------------------------------------
     # Public interface
@@ -64,47 +151,95 @@ class ConfigStorage:
 
     def get(self, key: str, default: Any = None) -> Any:
         """Return top-level config value for *key*, or *default*."""
-        with self._lock:
+        with self._lock_for(key):
             return self._data.get(key, default)
 
     def set(self, key: str, value: Any) -> None:
         """Set a top-level *key* and persist immediately."""
-        with self._lock:
+        with self._lock_for(key):
             self._data[key] = value
-            self._save_locked()
+            if key == "nodes":
+                self._reindex_nodes_locked()
+            self._save_locked(key)
+        if key == "nodes":
+            self._notify_node_listeners()
 
     def get_section(self, section: str) -> dict[str, Any]:
         """Return a shallow copy of a named subsection dict."""
-        with self._lock:
+        with self._lock_for(section):
             return dict(self._data.get(section, {}))
 
     def update_section(self, section: str, updates: dict[str, Any]) -> None:
         """Merge *updates* into a named subsection and persist."""
-        with self._lock:
+        with self._lock_for(section):
             self._data.setdefault(section, {}).update(updates)
-            self._save_locked()
+            if section == "nodes":
+                self._reindex_nodes_locked()
+            self._save_locked(section)
+        if section == "nodes":
+            self._notify_node_listeners()
 
-    def get_node(self, node_id: int) -> dict[str, Any]:
-        """Return persisted metadata for *node_id*, or an empty dict."""
-        with self._lock:
-            return dict(self._data.get("nodes", {}).get(str(node_id), {}))
+    def get_node(self, node_id: int) -> Mapping[str, Any]:
+        """Return a read-only view of *node_id*'s metadata (empty if unknown)."""
+        with self._locks["nodes"]:
+            node = self._nodes_by_int.get(node_id)
+            return MappingProxyType(node) if node is not None else _EMPTY_NODE
 
     def set_node(self, node_id: int, data: dict[str, Any]) -> None:
         """Persist metadata for *node_id* and save."""
-        with self._lock:
+        with self._locks["nodes"]:
             self._data.setdefault("nodes", {})[str(node_id)] = data
-            self._save_locked()
+            self._nodes_by_int[node_id] = data
+            self._save_locked("nodes")
+        self._notify_node_listeners()
+
+    def add_node_listener(self, callback: Callable[[], None]) -> None:
+        """Register *callback* to be called after any node metadata change."""
+        self._node_listeners.append(callback)
 
     def all(self) -> dict[str, Any]:
         """Return a deep-copy snapshot of the entire config."""
-        with self._lock:
-            return json.loads(json.dumps(self._data))
+        with self._all_locked():
+            return copy.deepcopy(self._data)
 
     def replace_all(self, new_data: dict[str, Any]) -> None:
         """Overwrite the entire config with *new_data* and persist."""
-        with self._lock:
+        with self._all_locked():
             self._data = dict(new_data)
+            self._reindex_nodes_locked()
             self._save_locked()
+        self._notify_node_listeners()
+
+    def flush(self) -> None:
+        """Write pending changes to disk now, if there are any."""
+        with self._write_lock:
+            with self._all_locked():
+                # nodes.json goes first: when migrating a config.json that
+                # still embeds "nodes", dropping them from config.json must
+                # not land on disk before their new home does.
+                pending: list[tuple[str, bytes]] = []
+                if self._dirty_nodes:
+                    pending.append((self._nodes_path,
+                                    _dumps(self._data.get("nodes", {}))))
+                if self._dirty_main:
+                    main = {k: v for k, v in self._data.items() if k != "nodes"}
+                    pending.append((self._path, _dumps(main)))
+                self._dirty_main = self._dirty_nodes = False
+            for path, buf in pending:
+                if buf == self._last_serialized.get(path):
+                    continue
+                if self._write_atomic(path, buf):
+                    self._last_serialized[path] = buf
+
+    def close(self) -> None:
+        """Stop the background flusher and write any pending changes."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush()
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -113,22 +248,109 @@ class ConfigStorage:
     def _load(self) -> None:
         """Load config from disk; writes defaults if the file is absent."""
         os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        loaded = False
         if os.path.exists(self._path):
             try:
-                with open(self._path, "r", encoding="utf-8") as fh:
-                    self._data = json.load(fh)
+                with open(self._path, "rb") as fh:
+                    raw = fh.read()
+                self._data = _loads(raw)
+                self._last_serialized[self._path] = raw
+                loaded = True
                 logger.info("Config loaded from %s", self._path)
-                return
             except (json.JSONDecodeError, OSError) as exc:
                 logger.warning("Could not read config (%s); using defaults", exc)
-        self._data = json.loads(json.dumps(_DEFAULTS))
+        if not loaded:
+            self._data = asdict(_DEFAULTS)
+            self._save_locked()
+            logger.info("Default config written to %s", self._path)
+
+        if os.path.exists(self._nodes_path):
+            try:
+                with open(self._nodes_path, "rb") as fh:
+                    raw = fh.read()
+                self._data["nodes"] = _loads(raw)
+                self._last_serialized[self._nodes_path] = raw
+                self._reindex_nodes_locked()
+                return
+            except (json.JSONDecodeError, OSError) as exc:
+                logger.warning("Could not read node metadata (%s)", exc)
+        # No separate nodes file yet (first run, or a config.json that still
+        # embeds "nodes"): write both files to move nodes into nodes.json.
+        self._data.setdefault("nodes", {})
+        self._reindex_nodes_locked()
         self._save_locked()
-        logger.info("Default config written to %s", self._path)
 
-    def _save_locked(self) -> None:
-        """Write current config to disk (must be called with _lock held)."""
+    def _reindex_nodes_locked(self) -> None:
+        """Rebuild _nodes_by_int from the nodes section (hold its lock)."""
+        nodes = self._data.get("nodes")
+        index: dict[int, dict[str, Any]] = {}
+        if isinstance(nodes, dict):
+            for key, value in nodes.items():
+                try:
+                    index[int(key)] = value
+                except (TypeError, ValueError):
+                    logger.warning("Ignoring node metadata with non-numeric "
+                                   "id %r", key)
+        self._nodes_by_int = index
+
+    def _notify_node_listeners(self) -> None:
+        """Call every node listener (without holding any lock)."""
+        for callback in self._node_listeners:
+            try:
+                callback()
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("Node listener raised: %s", exc)
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        """Return the lock guarding top-level *key*."""
+        return self._locks.get(key, self._struct_lock)
+
+    @contextlib.contextmanager
+    def _all_locked(self) -> Iterator[None]:
+        """Hold every lock, always acquired in the same order."""
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self._struct_lock)
+            for section in _SECTIONS:
+                stack.enter_context(self._locks[section])
+            yield
+
+    def _save_locked(self, section: Optional[str] = None) -> None:
+        """
+        Mark config dirty for the flusher (caller holds the lock for
+        *section*, or all locks).
+
+        *section* names the top-level key that changed; None marks both
+        files dirty.
+        """
+        if section is None or section == "nodes":
+            self._dirty_nodes = True
+        if section != "nodes":
+            self._dirty_main = True
+        self._wake.set()
+
+    def _flush_loop(self) -> None:
+        """Background thread: debounce change notifications and flush."""
+        while not self._closed:
+            self._wake.wait()
+            if self._closed:
+                return
+            self._stop.wait(_FLUSH_DEBOUNCE)
+            self._wake.clear()
+            self.flush()
+
+    def _write_atomic(self, path: str, buf: bytes) -> bool:
+        """Write *buf* to a temp file and rename it over *path*."""
+        tmp_path = path + ".tmp"
         try:
-            with open(self._path, "w", encoding="utf-8") as fh:
-                json.dump(self._data, fh, indent=2)
+            # Binary, buffer at least as large as the payload: one write()
+            # syscall with no text-codec layer.
+            with open(tmp_path, "wb",
+                      buffering=max(_WRITE_BUFFER_SIZE, len(buf))) as fh:
+                fh.write(buf)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, path)
+            return True
         except OSError as exc:
-            logger.error("Failed to save config: %s", exc)
+            logger.error("Failed to save %s: %s", path, exc)
+            return False
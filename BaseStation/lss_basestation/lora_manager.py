@@ -3,7 +3,8 @@ lora_manager.py — RFM95W SPI driver wrapper and packet receive/transmit loop.
 
 Responsibilities:
   - Initialise the RFM95W via adafruit-circuitpython-rfm9x
-  - Run a blocking receive loop on a background thread
+  - Run a single radio thread that both receives and transmits (LoRa is
+    half-duplex, so one thread owns the SPI bus)
   - Dispatch each received packet to packet_parser and then to sensor_store
   - Process piggybacked ACKs and standalone ACK packets
   - Drain the remote_config command queue and transmit due commands
@@ -12,18 +13,18 @@ Responsibilities:
 """
 
 import logging
+import sys
 import threading
 import time
 import struct
-from typing import Optional, TYPE_CHECKING
+from functools import lru_cache
+from typing import Any, Mapping, Optional, TYPE_CHECKING
 
 from . import config as cfg
 from .packet_parser import (
-    detect_packet_type,
-    parse_multi_sensor,
-    parse_legacy,
-    parse_command,
-    parse_ack,
+    MultiSensorPacket,
+    SensorValue,
+    parse_packet,
 )
 
 if TYPE_CHECKING:
@@ -46,6 +47,66 @@ except (ImportError, NotImplementedError):
     _HARDWARE_AVAILABLE = False
     logger.warning("Hardware libraries not available; LoRa radio in stub mode")
 
+# Optional: RPi.GPIO edge detection on DIO0 (RxDone) so the RX thread can
+# sleep until a packet arrives instead of polling the IRQ register.
+try:
+    import RPi.GPIO as GPIO  # type: ignore
+    _GPIO_AVAILABLE = True
+except (ImportError, RuntimeError):
+    _GPIO_AVAILABLE = False
+
+# SX127x registers used by the burst FIFO read in _receive_burst().
+_REG_FIFO = 0x00
+_REG_FIFO_ADDR_PTR = 0x0D
+_REG_FIFO_RX_CURRENT_ADDR = 0x10
+_REG_IRQ_FLAGS = 0x12
+_REG_RX_NB_BYTES = 0x13
+
+_RX_BUF_SIZE = 256              # SX127x FIFO size; bounds any single packet
+_RX_POLL_INTERVAL = 0.002       # Seconds between RxDone polls (no DIO0 IRQ)
+_RX_WAIT_TIMEOUT = 1.0          # Max seconds the radio thread blocks per wait
+_PURGE_INTERVAL = 1.0           # Seconds between command-queue purges
+
+# Alert kind → subject suffix.  The kind doubles as the rate-limit key suffix.
+_ALERT_TITLES = {
+    "temp_high": "High Temperature",
+    "temp_low": "Low Temperature",
+    "batt_critical": "Critical Battery",
+    "batt_low": "Low Battery",
+}
+
+
+@lru_cache(maxsize=256)
+def _alert_labels(node_id: int, kind: str) -> tuple[str, str]:
+    """Return the interned (subject, rate-limit key) pair for an alert."""
+    return (
+        sys.intern(f"Node {node_id}: {_ALERT_TITLES[kind]}"),
+        sys.intern(f"node_{node_id}_{kind}"),
+    )
+
+
+def _legacy_as_multi(pkt, rssi: Optional[float],
+                     snr: Optional[float]) -> MultiSensorPacket:
+    """Wrap a legacy packet in a minimal MultiSensorPacket for MQTT publish."""
+    return MultiSensorPacket(
+        sync_word=pkt.sync_word,
+        network_id=pkt.network_id,
+        packet_type=cfg.PACKET_LEGACY,
+        sensor_id=pkt.sensor_id,
+        battery_percent=pkt.battery_percent,
+        power_state=0,
+        last_command_seq=0,
+        ack_status=0,
+        location="",
+        zone="",
+        values=[
+            SensorValue(cfg.VALUE_TEMPERATURE, pkt.temperature),
+            SensorValue(cfg.VALUE_HUMIDITY, pkt.humidity),
+        ],
+        rssi=rssi,
+        snr=snr,
+    )
+
 
 class LoRaManager:
     """
@@ -71,32 +132,51 @@ class LoRaManager:
         self._alerts = alert_manager
         self._radio = None
         self._running = False
-        self._last_time_sync = time.time()  # avoid spurious sync on first loop tick
-        self._rx_thread: Optional[threading.Thread] = None
-        self._tx_thread: Optional[threading.Thread] = None
+        # Monotonic deadline, so wall-clock steps (NTP) can't skew the period;
+        # the first sync is one full interval after start.
+        self._next_time_sync = time.monotonic() + cfg.TIME_SYNC_INTERVAL
+        self._next_purge = 0.0
+        self._rx_buf = bytearray(_RX_BUF_SIZE)
+        # node_id → (generation, thresholds).  Entries from an older
+        # generation are stale; any node config change bumps it.
+        self._threshold_cache: dict[int, tuple[int, tuple]] = {}
+        self._node_cfg_gen = 0
+        config_storage.add_node_listener(self._invalidate_node_cfg)
+        # Wakes the radio thread: set by the DIO0 edge callback (RxDone),
+        # by RemoteConfig on every enqueue, and by stop().
+        self._wake = threading.Event()
+        self._irq_enabled = False       # True once DIO0 edge detect is live
+        remote_config.set_enqueue_callback(self._wake.set)
+        self._thread: Optional[threading.Thread] = None
 
     # ------------------------------------------------------------------
     # Lifecycle
     # ------------------------------------------------------------------
 
     def start(self) -> None:
-        """Initialise the radio (if available) and start background threads."""
+        """Initialise the radio (if available) and start the radio thread."""
         if _HARDWARE_AVAILABLE:
             self._init_radio()
         self._running = True
-        self._rx_thread = threading.Thread(
-            target=self._rx_loop, daemon=True, name="lora-rx"
-        )
-        self._tx_thread = threading.Thread(
-            target=self._tx_loop, daemon=True, name="lora-tx"
+        # The radio is only ever initialised here, so pick the loop body
+        # once instead of re-checking for a radio on every iteration.
+        self._thread = threading.Thread(
+            target=self._radio_loop if self._radio is not None
+            else self._radio_loop_stub,
+            daemon=True, name="lora",
         )
-        self._rx_thread.start()
-        self._tx_thread.start()
+        self._thread.start()
         logger.info("LoRa manager started (hardware=%s)", _HARDWARE_AVAILABLE)
 
     def stop(self) -> None:
-        """Signal background threads to exit."""
+        """Signal the radio thread to exit."""
         self._running = False
+        if self._irq_enabled:
+            try:
+                GPIO.remove_event_detect(cfg.LORA_IRQ)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.debug("DIO0 event detect removal failed: %s", exc)
+        self._wake.set()   # so the radio thread sees _running promptly
 
     @property
     def is_hardware_available(self) -> bool:
@@ -160,24 +240,57 @@ class LoRaManager:
         except Exception as exc:  # pylint: disable=broad-except
             logger.error("Radio init failed: %s", exc)
             self._radio = None
+            return
+        self._init_dio0()
+
+    def _init_dio0(self) -> None:
+        """
+        Route RxDone to DIO0 and wake the radio thread on its rising edge.
+
+        Falls back to polling the IRQ register if RPi.GPIO is unavailable
+        or the edge detector cannot be attached.
+        """
+        if not _GPIO_AVAILABLE:
+            logger.info("RPi.GPIO not available; polling for RxDone")
+            return
+        wake = self._wake
+        try:
+            self._radio.dio0_mapping = 0b00   # RegDioMapping1 DIO0 = RxDone
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(cfg.LORA_IRQ, GPIO.IN)
+            GPIO.add_event_detect(cfg.LORA_IRQ, GPIO.RISING,
+                                  callback=lambda _pin: wake.set())
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("DIO0 interrupt setup failed (%s); polling for "
+                           "RxDone", exc)
+            return
+        self._irq_enabled = True
+        logger.info("RX interrupt-driven on DIO0 (GPIO %d)", cfg.LORA_IRQ)
 
     # ------------------------------------------------------------------
-    # Internal — receive loop
+    # Internal — radio loop
     # ------------------------------------------------------------------
 
-    def _rx_loop(self) -> None:
-        """Blocking receive loop — runs on the lora-rx thread."""
+    def _radio_loop(self) -> None:
+        """
+        Radio thread: transmit whatever is due, then listen until a packet
+        arrives, a command is enqueued, or the next retry / time sync is due.
+
+        LoRa is half-duplex, so receiving and transmitting on one thread
+        costs nothing and leaves the SPI bus with a single owner.
+        """
+        radio = self._radio
         while self._running:
-            if self._radio is None:
-                time.sleep(0.1)
-                continue
+            self._maybe_send_time_sync()
+            self._drain_tx(radio)
+            now = time.monotonic()
+            self._purge_if_due(now)
+            timeout = min(_RX_WAIT_TIMEOUT, self._next_time_sync - now)
+            due_in = self._rc.next_due_delay()
+            if due_in is not None:
+                timeout = min(timeout, due_in)
             try:
-                # with_header=True returns the full buffer including any
-                # RadioHead header bytes that adafruit_rfm9x prepends/strips.
-                # Because Arduino (RadioLib) sends raw packets with no header,
-                # the library in non-header mode would silently strip 4 bytes
-                # we didn't add; requesting the header gives us the real bytes.
-                raw = self._radio.receive(timeout=0.5, with_header=True)
+                raw = self._receive_burst(timeout=max(0.0, timeout))
             except Exception as exc:  # pylint: disable=broad-except
                 logger.error("Radio receive error: %s", exc)
                 time.sleep(1)
@@ -186,66 +299,112 @@ class LoRaManager:
             if raw is None:
                 continue
 
-            rssi = getattr(self._radio, "last_rssi", None)
-            snr = getattr(self._radio, "last_snr", None)
-            raw_bytes = bytes(raw)
-            logger.info(
-                "RX %d bytes  RSSI=%s SNR=%s  hex=%s",
-                len(raw_bytes), rssi, snr,
-                raw_bytes[:16].hex(),
-            )
-            self._dispatch(raw_bytes, rssi=rssi, snr=snr)
+            rssi = getattr(radio, "last_rssi", None)
+            snr = getattr(radio, "last_snr", None)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "RX %d bytes  RSSI=%s SNR=%s  hex=%s",
+                    len(raw), rssi, snr,
+                    raw[:16].hex(),
+                )
+            # Parsed straight from the reused RX buffer — no per-packet copy.
+            self._dispatch(raw, rssi=rssi, snr=snr)
+
+    def _radio_loop_stub(self) -> None:
+        """
+        Radio loop used without a radio: nothing is sent or received, but
+        time syncs are still scheduled and the command queue is purged.
+        """
+        while self._running:
+            self._maybe_send_time_sync()
+            self._purge_if_due(time.monotonic())
+            self._wake.wait(0.5)
+            self._wake.clear()
+
+    def _receive_burst(self, timeout: float) -> Optional[memoryview]:
+        """
+        Wait up to *timeout* seconds for RxDone, then read the whole FIFO.
+
+        With a DIO0 interrupt the thread blocks on ``_wake``; otherwise the
+        IRQ register is polled.  Either way the wait ends early when
+        ``_wake`` is set for new TX work.
+
+        Replaces ``RFM9x.receive()``: the packet is read with one SPI
+        transaction into the preallocated ``_rx_buf`` and returned as a
+        view of it, valid until the next call.  The raw FIFO contents are
+        returned as-is — Arduino (RadioLib) sends raw packets with no
+        RadioHead header, so no header stripping or address filtering is
+        applied.  Returns None on timeout, CRC error or an empty FIFO.
+        """
+        radio = self._radio
+        radio.listen()
+        wake = self._wake
+        if self._irq_enabled:
+            wake.wait(timeout)
+            wake.clear()
+            # Confirm on the register: the wake may be for TX work or a
+            # stale edge, and a missed edge is still picked up once the
+            # wait times out.
+            if not radio.rx_done():
+                return None
+        else:
+            deadline = time.monotonic() + timeout
+            while not radio.rx_done():
+                if wake.is_set() or time.monotonic() >= deadline:
+                    wake.clear()
+                    return None
+                time.sleep(_RX_POLL_INTERVAL)
+
+        radio.last_rssi = radio.rssi
+        radio.last_snr = radio.snr
+        radio.idle()
+        length = 0
+        if radio.enable_crc and radio.crc_error():
+            radio.crc_error_count += 1
+        else:
+            length = radio._read_u8(_REG_RX_NB_BYTES)  # pylint: disable=protected-access
+            if length:
+                radio._write_u8(  # pylint: disable=protected-access
+                    _REG_FIFO_ADDR_PTR,
+                    radio._read_u8(_REG_FIFO_RX_CURRENT_ADDR),  # pylint: disable=protected-access
+                )
+                radio._read_into(_REG_FIFO, self._rx_buf, length)  # pylint: disable=protected-access
+        radio.listen()
+        radio._write_u8(_REG_IRQ_FLAGS, 0xFF)  # pylint: disable=protected-access
+        return memoryview(self._rx_buf)[:length] if length else None
 
-    def _dispatch(self, raw: bytes, rssi: Optional[float] = None,
+    def _dispatch(self, raw: "bytes | memoryview",
+                  rssi: Optional[float] = None,
                   snr: Optional[float] = None) -> None:
-        """Route a raw packet to the correct parser and handler."""
-        ptype = detect_packet_type(raw)
+        """
+        Route a raw packet to the correct parser and handler.
+
+        *raw* may be a view of the reused RX buffer: it is only valid for
+        the duration of this call, so nothing may keep a reference to it.
+        """
+        ptype, pkt = parse_packet(raw, rssi=rssi, snr=snr)
         if ptype is None:
-            logger.info("Unrecognised packet (%d bytes) — first 8: %s",
-                        len(raw), raw[:8].hex())
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Unrecognised packet (%d bytes) — first 8: %s",
+                            len(raw), raw[:8].hex())
             return
+        if pkt is None:
+            return      # recognised but invalid; the parser has logged why
 
         if ptype == cfg.PACKET_MULTI_SENSOR:
-            pkt = parse_multi_sensor(raw, rssi=rssi, snr=snr)
-            if pkt:
-                self._handle_multi_sensor(pkt)
+            self._handle_multi_sensor(pkt)
 
         elif ptype == cfg.PACKET_LEGACY:
-            pkt = parse_legacy(raw, rssi=rssi)
-            if pkt:
-                self._store.ingest_legacy(pkt, rssi=rssi, snr=snr)
-                if self._mqtt:
-                    # Wrap legacy into a minimal multi-sensor for MQTT publish
-                    from .packet_parser import MultiSensorPacket, SensorValue
-                    mp = MultiSensorPacket(
-                        sync_word=pkt.sync_word,
-                        network_id=pkt.network_id,
-                        packet_type=cfg.PACKET_LEGACY,
-                        sensor_id=pkt.sensor_id,
-                        battery_percent=pkt.battery_percent,
-                        power_state=0,
-                        last_command_seq=0,
-                        ack_status=0,
-                        location="",
-                        zone="",
-                        values=[
-                            SensorValue(cfg.VALUE_TEMPERATURE, pkt.temperature),
-                            SensorValue(cfg.VALUE_HUMIDITY, pkt.humidity),
-                        ],
-                        rssi=rssi,
-                        snr=snr,
-                    )
-                    self._mqtt.publish_packet(mp)
+            self._store.ingest_legacy(pkt, rssi=rssi, snr=snr)
+            if self._mqtt:
+                self._mqtt.publish_packet(_legacy_as_multi(pkt, rssi, snr))
 
         elif ptype == cfg.PACKET_ACK:
-            pkt = parse_ack(raw)
-            if pkt:
-                success = pkt.command_type == cfg.CMD_ACK
-                self._rc.process_ack(pkt.sensor_id, pkt.sequence_number, success)
+            success = pkt.command_type == cfg.CMD_ACK
+            self._rc.process_ack(pkt.sensor_id, pkt.sequence_number, success)
 
         elif ptype == cfg.PACKET_CONFIG:
-            pkt = parse_command(raw)
-            if pkt and pkt.command_type == cfg.CMD_SENSOR_ANNOUNCE:
+            if pkt.command_type == cfg.CMD_SENSOR_ANNOUNCE:
                 self._handle_announce(pkt.target_sensor_id)
 
     def _handle_multi_sensor(self, pkt) -> None:
@@ -270,80 +429,111 @@ class LoRaManager:
 
     def _check_alerts(self, pkt) -> None:
         """Evaluate threshold conditions and fire alerts if breached."""
-        node_cfg = self._cfg_node(pkt.sensor_id)
+        node_id = pkt.sensor_id
+        temp_high, temp_low, batt_critical, batt_low = self._thresholds(node_id)
+        temperature = cfg.VALUE_TEMPERATURE
         for sv in pkt.values:
-            if sv.type == cfg.VALUE_TEMPERATURE:
-                high = node_cfg.get("temp_thresh_high", 50.0)
-                low = node_cfg.get("temp_thresh_low", -20.0)
-                if sv.value > high:
-                    self._alerts.send(
-                        f"Node {pkt.sensor_id}: High Temperature",
-                        f"Temperature {sv.value:.1f}°C exceeds threshold {high}°C",
-                        key=f"node_{pkt.sensor_id}_temp_high",
-                    )
-                elif sv.value < low:
-                    self._alerts.send(
-                        f"Node {pkt.sensor_id}: Low Temperature",
-                        f"Temperature {sv.value:.1f}°C below threshold {low}°C",
-                        key=f"node_{pkt.sensor_id}_temp_low",
-                    )
-        if pkt.battery_percent <= node_cfg.get("battery_thresh_critical", 10):
-            self._alerts.send(
-                f"Node {pkt.sensor_id}: Critical Battery",
-                f"Battery at {pkt.battery_percent}%",
-                key=f"node_{pkt.sensor_id}_batt_critical",
-            )
-        elif pkt.battery_percent <= node_cfg.get("battery_thresh_low", 20):
-            self._alerts.send(
-                f"Node {pkt.sensor_id}: Low Battery",
-                f"Battery at {pkt.battery_percent}%",
-                key=f"node_{pkt.sensor_id}_batt_low",
-            )
+            if sv.type != temperature:
+                continue
+            value = sv.value
+            if temp_low <= value <= temp_high:
+                continue
+            if value > temp_high:
+                subject, key = _alert_labels(node_id, "temp_high")
+                self._alerts.send(
+                    subject,
+                    f"Temperature {value:.1f}°C exceeds threshold {temp_high}°C",
+                    key=key,
+                )
+            elif value < temp_low:
+                subject, key = _alert_labels(node_id, "temp_low")
+                self._alerts.send(
+                    subject,
+                    f"Temperature {value:.1f}°C below threshold {temp_low}°C",
+                    key=key,
+                )
+        battery = pkt.battery_percent
+        if battery > batt_low and battery > batt_critical:
+            return
+        kind = "batt_critical" if battery <= batt_critical else "batt_low"
+        subject, key = _alert_labels(node_id, kind)
+        self._alerts.send(subject, f"Battery at {battery}%", key=key)
+
+    def _thresholds(self, node_id: int) -> tuple[float, float, int, int]:
+        """
+        Return (temp_high, temp_low, battery_critical, battery_low) for
+        *node_id*, cached until the node config changes.
+        """
+        gen = self._node_cfg_gen
+        entry = self._threshold_cache.get(node_id)
+        if entry is not None and entry[0] == gen:
+            return entry[1]
+        node_cfg = self._cfg_node(node_id)
+        thresholds = (
+            node_cfg.get("temp_thresh_high", 50.0),
+            node_cfg.get("temp_thresh_low", -20.0),
+            node_cfg.get("battery_thresh_critical", 10),
+            node_cfg.get("battery_thresh_low", 20),
+        )
+        # Tagged with the generation read *before* the lookup, so a change
+        # that lands meanwhile leaves this entry already stale.
+        self._threshold_cache[node_id] = (gen, thresholds)
+        return thresholds
+
+    def _invalidate_node_cfg(self) -> None:
+        """ConfigStorage node listener: drop every cached threshold set."""
+        self._node_cfg_gen += 1
 
-    def _cfg_node(self, node_id: int) -> dict:
-        """Return persisted node config; fall back to empty dict."""
+    def _cfg_node(self, node_id: int) -> Mapping[str, Any]:
+        """Return persisted node config (read-only); empty if unknown."""
         return self._cfg.get_node(node_id)
 
     # ------------------------------------------------------------------
-    # Internal — transmit loop
+    # Internal — transmit
     # ------------------------------------------------------------------
 
-    def _tx_loop(self) -> None:
-        """Drain the command queue and send periodic time-syncs."""
-        while self._running:
-            self._maybe_send_time_sync()
-            cmd = self._rc.next_due()
-            if cmd and self._radio is not None:
-                try:
-                    # Set the RadioHead destination byte to the target node ID.
-                    # adafruit_rfm9x prepends [dest, node, id, flags] on TX;
-                    # the Arduino offset-4 fallback strips these before parsing.
-                    self._radio.send(
-                        cmd.raw_packet,
-                        destination=cmd.node_id,
-                        node=cfg.BASE_STATION_ID,
-                    )
-                    self._rc.mark_sent(cmd.sequence_number)
+    def _drain_tx(self, radio) -> None:
+        """Transmit every command that is currently due."""
+        for cmd in self._rc.next_due_batch():
+            if not self._running:
+                return
+            try:
+                # Set the RadioHead destination byte to the target node ID.
+                # adafruit_rfm9x prepends [dest, node, id, flags] on TX;
+                # the Arduino offset-4 fallback strips these before parsing.
+                radio.send(
+                    cmd.raw_packet,
+                    destination=cmd.node_id,
+                    node=cfg.BASE_STATION_ID,
+                )
+                self._rc.mark_sent(cmd.sequence_number)
+                if logger.isEnabledFor(logging.DEBUG):
                     logger.debug(
                         "Sent %s → node %d (seq %d, attempt %d)",
-                        cfg.CMD_NAMES.get(cmd.command_type, f"0x{cmd.command_type:02X}"),
+                        cfg.cmd_name(cmd.command_type),
                         cmd.node_id, cmd.sequence_number, cmd.attempts + 1,
                     )
-                except Exception as exc:  # pylint: disable=broad-except
-                    logger.error("Radio send failed: %s", exc)
-            # Periodically purge completed entries
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("Radio send failed: %s", exc)
+                time.sleep(1)   # the command stays due; don't spin
+                return
+
+    def _purge_if_due(self, now: float) -> None:
+        """Purge completed commands at most once per _PURGE_INTERVAL."""
+        if now >= self._next_purge:
+            self._next_purge = now + _PURGE_INTERVAL
             self._rc.purge_completed()
-            time.sleep(0.05)
 
     def _maybe_send_time_sync(self) -> None:
-        """Broadcast CMD_TIME_SYNC to all nodes every TIME_SYNC_INTERVAL seconds."""
-        now = time.time()
-        if now - self._last_time_sync < cfg.TIME_SYNC_INTERVAL:
+        """
+        Broadcast CMD_TIME_SYNC every TIME_SYNC_INTERVAL seconds.
+
+        One frame addressed to NODE_ID_BROADCAST reaches every listening
+        node, so airtime does not grow with the node count.
+        """
+        now = time.monotonic()
+        if now < self._next_time_sync:
             return
-        self._last_time_sync = now
-        for node in self._store.get_all_nodes():
-            if node.online:
-                self._rc.enqueue_time_sync(
-                    node.node_id, int(now), 0
-                )
-        logger.info("Time sync queued for all online nodes")
+        self._next_time_sync = now + cfg.TIME_SYNC_INTERVAL
+        self._rc.enqueue_time_sync_broadcast(int(time.time()), 0)
+        logger.info("Time sync broadcast queued")
@@ -2,18 +2,29 @@
 mqtt_manager.py — Publish sensor readings to an MQTT broker.
 
 Topic structure:
+    <prefix>/<node_id>/state           retained JSON, one per packet:
+        {"battery": 87, "power_state": 1, "rssi": -70.0, "snr": 9.25,
+         "values": {"temperature": 22.5, ...}}
+    <prefix>/<node_id>/online          (payload "1" or "0")
+
+Unless per_value_topics is turned off, each field is also published on its
+own topic for subscribers of the original topic tree:
     <prefix>/<node_id>/<value_name>   e.g. lss/3/temperature
     <prefix>/<node_id>/battery
     <prefix>/<node_id>/rssi
-    <prefix>/<node_id>/online          (payload "1" or "0")
 
 All publishes are fire-and-forget (QoS 0).  The manager reconnects
 automatically if the broker becomes unavailable.
+
+Callers never block on the broker: messages are appended to a bounded
+queue that a dedicated publisher thread drains into the paho client.
 """
 
+import collections
+import json
 import logging
 import threading
-from typing import Optional
+from typing import Any, Optional
 
 from . import config as cfg
 from .packet_parser import MultiSensorPacket
@@ -27,24 +38,65 @@ except ImportError:
     _PAHO_AVAILABLE = False
     logger.warning("paho-mqtt not installed; MQTT publishing disabled")
 
+try:
+    import orjson  # type: ignore
+
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# Outgoing messages held while the publisher thread catches up; the oldest
+# are discarded first if the broker stalls for longer than this covers.
+_QUEUE_MAXLEN = 4096
+
+# Broker reconnect back-off bounds (seconds); paho's default max is 120 s.
+_RECONNECT_MIN_DELAY = 1
+_RECONNECT_MAX_DELAY = 30
+
+# MQTT name for every possible (uint8) value type, indexed by type id, so
+# that name resolution is a single tuple index with no fallback branch.
+_VALUE_KEYS = tuple(cfg.value_name(t) or f"value_{t}" for t in range(256))
+
+# Per-node topic suffixes, in the order _node_topics() returns them.
+_NODE_SUFFIXES = ("state", "battery", "power_state", "rssi", "snr", "online")
+
 
 class MQTTManager:
     """Thin wrapper around a paho MQTT client with auto-reconnect."""
 
     def __init__(self, broker: str, port: int, username: str, password: str,
-                 topic_prefix: str, enabled: bool = True) -> None:
+                 topic_prefix: str, enabled: bool = True,
+                 per_value_topics: bool = True) -> None:
         self._broker = broker
         self._port = port
         self._username = username
         self._password = password
         self._prefix = topic_prefix.rstrip("/")
         self._enabled = enabled and _PAHO_AVAILABLE
+        self._per_value_topics = per_value_topics
+        # Topic strings are built once: per-node topics on first use, and a
+        # "%"-template per value type, indexed by type id.
+        self._topic_cache: dict[int, tuple[str, ...]] = {}
+        escaped = self._prefix.replace("%", "%%")
+        self._value_topics = tuple(f"{escaped}/%d/{name}"
+                                   for name in _VALUE_KEYS)
         self._client: Optional["mqtt.Client"] = None
-        self._lock = threading.Lock()
         self._connected = False
+        # deque.append / popleft are atomic, so producers need no lock.
+        self._queue: collections.deque[tuple[str, str | bytes, bool]] = \
+            collections.deque(maxlen=_QUEUE_MAXLEN)
+        self._wake = threading.Event()
+        self._running = False
+        self._publisher: Optional[threading.Thread] = None
 
         if self._enabled:
             self._init_client()
+            self._running = True
+            self._publisher = threading.Thread(
+                target=self._publish_loop, daemon=True, name="mqtt-publisher"
+            )
+            self._publisher.start()
 
     # ------------------------------------------------------------------
     # Public interface
@@ -54,25 +106,36 @@ class MQTTManager:
         """Publish all values from *packet* to MQTT."""
         if not self._enabled:
             return
-        nid = str(packet.sensor_id)
-        self._publish(f"{self._prefix}/{nid}/battery",
-                      str(packet.battery_percent))
-        self._publish(f"{self._prefix}/{nid}/power_state",
-                      str(packet.power_state))
+        nid = packet.sensor_id
+        t_state, t_batt, t_power, t_rssi, t_snr, _ = self._node_topics(nid)
+        state: dict[str, object] = {
+            "battery": packet.battery_percent,
+            "power_state": packet.power_state,
+        }
+        if packet.rssi is not None:
+            state["rssi"] = round(packet.rssi, 1)
+        if packet.snr is not None:
+            state["snr"] = round(packet.snr, 2)
+        keys = _VALUE_KEYS
+        state["values"] = {keys[t]: round(v, 4) for t, v in packet.values}
+        self._publish(t_state, _dumps(state), retain=True)
+        if not self._per_value_topics:
+            return
+        self._publish(t_batt, str(packet.battery_percent))
+        self._publish(t_power, str(packet.power_state))
         if packet.rssi is not None:
-            self._publish(f"{self._prefix}/{nid}/rssi", f"{packet.rssi:.1f}")
+            self._publish(t_rssi, f"{packet.rssi:.1f}")
         if packet.snr is not None:
-            self._publish(f"{self._prefix}/{nid}/snr", f"{packet.snr:.2f}")
-        for sv in packet.values:
-            name = cfg.VALUE_NAMES.get(sv.type, f"value_{sv.type}")
-            self._publish(f"{self._prefix}/{nid}/{name}", f"{sv.value:.4f}")
+            self._publish(t_snr, f"{packet.snr:.2f}")
+        value_topics = self._value_topics
+        for vtype, value in packet.values:
+            self._publish(value_topics[vtype] % nid, f"{value:.4f}")
 
     def publish_online_status(self, node_id: int, online: bool) -> None:
         """Publish online/offline status for *node_id*."""
         if not self._enabled:
             return
-        self._publish(f"{self._prefix}/{node_id}/online",
-                      "1" if online else "0")
+        self._publish(self._node_topics(node_id)[5], "1" if online else "0")
 
     def test_connection(self) -> tuple[bool, str]:
         """
@@ -96,14 +159,18 @@ class MQTTManager:
             return False, str(exc)
 
     def disconnect(self) -> None:
-        """Gracefully disconnect the MQTT client."""
-        with self._lock:
-            if self._client and self._connected:
-                try:
-                    self._client.disconnect()
-                except Exception:  # pylint: disable=broad-except
-                    pass
-                self._connected = False
+        """Flush queued messages and gracefully disconnect the MQTT client."""
+        if self._publisher is not None:
+            self._running = False
+            self._wake.set()
+            self._publisher.join(timeout=5)
+            self._publisher = None
+        if self._client and self._connected:
+            try:
+                self._client.disconnect()
+            except Exception:  # pylint: disable=broad-except
+                pass
+            self._connected = False
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -120,6 +187,11 @@ class MQTTManager:
 
         self._client.on_connect = self._on_connect
         self._client.on_disconnect = self._on_disconnect
+        # Come back quickly after a broker restart, and bound paho's own
+        # outgoing queue like ours so a stalled socket can't grow memory.
+        self._client.reconnect_delay_set(min_delay=_RECONNECT_MIN_DELAY,
+                                         max_delay=_RECONNECT_MAX_DELAY)
+        self._client.max_queued_messages_set(_QUEUE_MAXLEN)
 
         # Non-blocking connect; loop_start() handles reconnects.
         try:
@@ -142,12 +214,39 @@ class MQTTManager:
             logger.warning("MQTT disconnected unexpectedly (rc=%d); "
                            "paho will retry", rc)
 
-    def _publish(self, topic: str, payload: str) -> None:
-        """Publish a single message; silently skips if not connected."""
-        with self._lock:
-            if not self._client or not self._connected:
+    def _node_topics(self, node_id: int) -> tuple[str, ...]:
+        """Return the _NODE_SUFFIXES topics for *node_id*, building them once."""
+        topics = self._topic_cache.get(node_id)
+        if topics is None:
+            base = f"{self._prefix}/{node_id}/"
+            topics = tuple(base + suffix for suffix in _NODE_SUFFIXES)
+            self._topic_cache[node_id] = topics
+        return topics
+
+    def _publish(self, topic: str, payload: str | bytes,
+                 retain: bool = False) -> None:
+        """Queue a single message; silently skips if not connected."""
+        if not self._connected:
+            return
+        self._queue.append((topic, payload, retain))
+        self._wake.set()
+
+    def _publish_loop(self) -> None:
+        """Publisher thread: drain the queue into the paho client."""
+        queue = self._queue
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while queue:
+                self._send(*queue.popleft())
+            if not self._running:
                 return
-            try:
-                self._client.publish(topic, payload, qos=0, retain=False)
-            except Exception as exc:  # pylint: disable=broad-except
-                logger.debug("MQTT publish failed (%s): %s", topic, exc)
+
+    def _send(self, topic: str, payload: str | bytes, retain: bool) -> None:
+        """Hand one message to paho (which has its own locking)."""
+        if not self._client or not self._connected:
+            return
+        try:
+            self._client.publish(topic, payload, qos=0, retain=retain)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("MQTT publish failed (%s): %s", topic, exc)
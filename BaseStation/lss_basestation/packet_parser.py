@@ -3,12 +3,18 @@ packet_parser.py — Deserialise all LSS packet types from raw bytes.
 
 Packet formats are defined in LSS.md (Packet Protocol section).
 All structs are little-endian and packed (no padding).
+
+Parsers accept any bytes-like object (bytes, bytearray, memoryview) and
+never keep a reference to it, so callers may pass a view of a reused
+receive buffer.
 """
 
+import binascii
 import struct
 import logging
 from dataclasses import dataclass, field
-from typing import Optional
+from functools import partial
+from typing import Any, NamedTuple, Optional
 
 from . import config as cfg
 
@@ -23,48 +29,68 @@ logger = logging.getLogger(__name__)
 #   uint8 powerState, uint8 lastCommandSeq, uint8 ackStatus,
 #   char[32] location, char[16] zone
 _MULTI_HEADER_FMT = "<HHBBBBBBBx32s16s"
-_MULTI_HEADER_SIZE = struct.calcsize(_MULTI_HEADER_FMT)  # should be 58
+_MULTI_HEADER = struct.Struct(_MULTI_HEADER_FMT)
+_MULTI_HEADER_SIZE = _MULTI_HEADER.size  # should be 58
 
 # SensorValuePacket: uint8 type, float value
 _VALUE_FMT = "<Bf"
 _VALUE_SIZE = struct.calcsize(_VALUE_FMT)  # 5 bytes
+_MAX_VALUES = 16
 
 # CommandPacket: uint16 syncWord, uint8 commandType, uint8 targetSensorId,
 #   uint8 sequenceNumber, uint8 dataLength, uint8[192] data, uint16 checksum
 _CMD_FMT = "<HBBBBx192sH"
-_CMD_SIZE = struct.calcsize(_CMD_FMT)  # 200 bytes total
+_CMD = struct.Struct(_CMD_FMT)
+_CMD_SIZE = _CMD.size  # 200 bytes total
+_CMD_PAYLOAD = struct.Struct(_CMD_FMT[:-1])  # everything but the checksum
 
 # AckPacket: same layout as CommandPacket but commandType is CMD_ACK/NACK
 _ACK_FMT = "<HBBBBx192sH"
-_ACK_SIZE = struct.calcsize(_ACK_FMT)
+_ACK = struct.Struct(_ACK_FMT)
+_ACK_SIZE = _ACK.size
 
 # Legacy SensorData (v1): kept for backward-compatibility parsing only.
 # uint16 syncWord, uint8 sensorId, uint16 networkId, float temperature,
 #   float humidity, uint8 batteryPercent, int8 rssi, float snr
 _LEGACY_FMT = "<HBHffBbf"
-_LEGACY_SIZE = struct.calcsize(_LEGACY_FMT)
+_LEGACY = struct.Struct(_LEGACY_FMT)
+_LEGACY_SIZE = _LEGACY.size
+
+# Sync words and trailing checksums
+_U16 = struct.Struct("<H")
 
 
 # ---------------------------------------------------------------------------
 # Parsed data classes
 # ---------------------------------------------------------------------------
 
-@dataclass
-class SensorValue:
+# Display name and unit for every possible (uint8) value type, resolved once
+# so SensorValue.name / .unit are a single tuple index.
+_VALUE_NAMES = tuple(cfg.value_name(t) or f"type_{t}" for t in range(256))
+_VALUE_UNITS = tuple(cfg.value_unit(t) for t in range(256))
+
+
+class SensorValue(NamedTuple):
     """A single typed measurement from a multi-sensor telemetry packet."""
-    type: int
+    type: int       # uint8 ValueType
     value: float
 
     @property
     def unit(self) -> str:
-        return cfg.VALUE_UNITS.get(self.type, "")
+        return _VALUE_UNITS[self.type]
 
     @property
     def name(self) -> str:
-        return cfg.VALUE_NAMES.get(self.type, f"type_{self.type}")
+        return _VALUE_NAMES[self.type]
+
 
+# Builds a SensorValue from a (type, value) pair entirely in C; the
+# generated SensorValue._make is a Python function, which made it the
+# costliest per-value step of parse_multi_sensor.
+_make_sensor_value = partial(tuple.__new__, SensorValue)
 
-@dataclass
+
+@dataclass(slots=True)
 class MultiSensorPacket:
     """Parsed representation of a PACKET_MULTI_SENSOR frame."""
     sync_word: int
@@ -82,7 +108,7 @@ class MultiSensorPacket:
     snr: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CommandPacket:
     """Parsed representation of a PACKET_CONFIG / command frame."""
     sync_word: int
@@ -93,7 +119,7 @@ class CommandPacket:
     data: bytes
 
 
-@dataclass
+@dataclass(slots=True)
 class AckPacket:
     """Parsed representation of a CMD_ACK / CMD_NACK response."""
     sync_word: int
@@ -105,7 +131,7 @@ class AckPacket:
     data: bytes
 
 
-@dataclass
+@dataclass(slots=True)
 class LegacyPacket:
     """Parsed representation of a v1 SensorData packet."""
     sync_word: int
@@ -122,18 +148,28 @@ class LegacyPacket:
 # CRC-16 (CCITT-FALSE / poly 0x1021, init 0xFFFF, no reflection)
 # ---------------------------------------------------------------------------
 
-def _crc16(data: bytes) -> int:
-    """Compute CRC-16/CCITT-FALSE over *data*."""
-    crc = 0xFFFF
-    for byte in data:
-        crc ^= byte << 8
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = (crc << 1) ^ 0x1021
-            else:
-                crc <<= 1
-        crc &= 0xFFFF
-    return crc
+def _crc16(data: bytes, length: Optional[int] = None) -> int:
+    """
+    Compute CRC-16/CCITT-FALSE over the first *length* bytes of *data*
+    (all of it if *length* is None) without copying them.
+
+    binascii.crc_hqx implements the same polynomial (0x1021, MSB-first,
+    no final xor) in C; seeding it with 0xFFFF gives CCITT-FALSE.  Frames
+    are at most 200 bytes, so the cost is dominated by the call itself
+    rather than the per-byte work.
+
+    Must agree with the firmware's lss_crc16() (LSS-Arduino/src/packets.cpp);
+    both test suites pin the same vectors.
+    """
+    if length is not None and length != len(data):
+        data = memoryview(data)[:length]
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+# _VALUES_UNPACK[n] unpacks n SensorValuePackets in one call.  All 17
+# Structs are compiled at import so the parser only indexes a tuple.
+_VALUES_UNPACK = tuple(struct.Struct("<" + _VALUE_FMT[1:] * count).unpack_from
+                       for count in range(_MAX_VALUES + 1))
 
 
 # ---------------------------------------------------------------------------
@@ -148,7 +184,7 @@ def detect_packet_type(raw: bytes) -> Optional[int]:
     """
     if len(raw) < 2:
         return None
-    sync = struct.unpack_from("<H", raw, 0)[0]
+    sync = _U16.unpack_from(raw, 0)[0]
     if sync == cfg.SYNC_LEGACY and len(raw) >= _LEGACY_SIZE:
         return cfg.PACKET_LEGACY
     if sync == cfg.SYNC_MULTI_SENSOR:
@@ -163,6 +199,30 @@ def detect_packet_type(raw: bytes) -> Optional[int]:
     return None
 
 
+def parse_packet(raw: bytes, rssi: Optional[float] = None,
+                 snr: Optional[float] = None) -> tuple[Optional[int], Any]:
+    """
+    Identify and deserialise *raw* in one step, reading the sync word once.
+
+    Returns ``(packet_type, packet)``: *packet_type* is one of the PACKET_*
+    constants (as detect_packet_type() would return) or None if the frame
+    is unrecognised; *packet* is the parsed object, or None if the frame
+    was recognised but failed validation (length or checksum).
+    """
+    if len(raw) < 2:
+        return None, None
+    sync = _U16.unpack_from(raw, 0)[0]
+    if sync == cfg.SYNC_MULTI_SENSOR:
+        return cfg.PACKET_MULTI_SENSOR, _decode_multi_sensor(raw, rssi, snr)
+    if sync == cfg.SYNC_COMMAND:
+        if len(raw) >= 3 and raw[2] in (cfg.CMD_ACK, cfg.CMD_NACK):
+            return cfg.PACKET_ACK, _decode_ack(raw)
+        return cfg.PACKET_CONFIG, _decode_command(raw)
+    if sync == cfg.SYNC_LEGACY and len(raw) >= _LEGACY_SIZE:
+        return cfg.PACKET_LEGACY, _decode_legacy(raw, rssi)
+    return None, None
+
+
 def parse_multi_sensor(raw: bytes, rssi: Optional[float] = None,
                        snr: Optional[float] = None) -> Optional[MultiSensorPacket]:
     """
@@ -171,12 +231,62 @@ def parse_multi_sensor(raw: bytes, rssi: Optional[float] = None,
     Returns None if the data is too short, the checksum fails, or the
     sync word is wrong.
     """
+    # Reject on the sync word alone before decoding the 58-byte header.
+    if len(raw) >= 2:
+        sync = _U16.unpack_from(raw, 0)[0]
+        if sync != cfg.SYNC_MULTI_SENSOR:
+            logger.debug("unexpected sync word 0x%04X in multi-sensor packet",
+                         sync)
+            return None
+    return _decode_multi_sensor(raw, rssi, snr)
+
+
+def parse_command(raw: bytes) -> Optional[CommandPacket]:
+    """
+    Deserialise a CommandPacket from *raw*.
+
+    Returns None on length, sync-word, or checksum failure.
+    """
+    if len(raw) >= 2 and _U16.unpack_from(raw, 0)[0] != cfg.SYNC_COMMAND:
+        return None
+    return _decode_command(raw)
+
+
+def parse_ack(raw: bytes) -> Optional[AckPacket]:
+    """
+    Deserialise an AckPacket (CMD_ACK or CMD_NACK) from *raw*.
+
+    Returns None on failure.
+    """
+    if len(raw) >= 2 and _U16.unpack_from(raw, 0)[0] != cfg.SYNC_COMMAND:
+        return None
+    return _decode_ack(raw)
+
+
+def parse_legacy(raw: bytes, rssi: Optional[float] = None) -> Optional[LegacyPacket]:
+    """
+    Deserialise a legacy v1 SensorData packet from *raw*.
+
+    Legacy packets carry no checksum; the sync word is the only guard.
+    """
+    if len(raw) >= 2 and _U16.unpack_from(raw, 0)[0] != cfg.SYNC_LEGACY:
+        return None
+    return _decode_legacy(raw, rssi)
+
+
+# ---------------------------------------------------------------------------
+# Decoders (sync word already checked by the caller)
+# ---------------------------------------------------------------------------
+
+def _decode_multi_sensor(raw: bytes, rssi: Optional[float],
+                         snr: Optional[float]) -> Optional[MultiSensorPacket]:
+    """Validate length and CRC of a multi-sensor frame and decode it."""
     if len(raw) < _MULTI_HEADER_SIZE + 2:
         logger.debug("multi-sensor packet too short (%d bytes)", len(raw))
         return None
 
     try:
-        fields = struct.unpack_from(_MULTI_HEADER_FMT, raw, 0)
+        fields = _MULTI_HEADER.unpack_from(raw, 0)
     except struct.error as exc:
         logger.warning("multi-sensor header unpack failed: %s", exc)
         return None
@@ -184,13 +294,10 @@ def parse_multi_sensor(raw: bytes, rssi: Optional[float] = None,
     (sync, network_id, pkt_type, sensor_id, value_count, batt_pct,
      power_state, last_cmd_seq, ack_status, location_b, zone_b) = fields
 
-    if sync != cfg.SYNC_MULTI_SENSOR:
-        logger.debug("unexpected sync word 0x%04X in multi-sensor packet", sync)
-        return None
-
-    if value_count > 16:
-        logger.warning("value_count %d exceeds maximum 16; clamping", value_count)
-        value_count = 16
+    if value_count > _MAX_VALUES:
+        logger.warning("value_count %d exceeds maximum %d; clamping",
+                       value_count, _MAX_VALUES)
+        value_count = _MAX_VALUES
 
     expected_len = _MULTI_HEADER_SIZE + value_count * _VALUE_SIZE + 2
     if len(raw) < expected_len:
@@ -200,20 +307,20 @@ def parse_multi_sensor(raw: bytes, rssi: Optional[float] = None,
 
     # Verify checksum (covers header + all value entries)
     payload_end = _MULTI_HEADER_SIZE + value_count * _VALUE_SIZE
-    received_crc = struct.unpack_from("<H", raw, payload_end)[0]
-    computed_crc = _crc16(raw[:payload_end])
+    received_crc = _U16.unpack_from(raw, payload_end)[0]
+    computed_crc = _crc16(raw, payload_end)
     if received_crc != computed_crc:
         logger.warning("CRC mismatch on multi-sensor packet from node %d "
                        "(got 0x%04X, want 0x%04X)", sensor_id,
                        received_crc, computed_crc)
         return None
 
-    values: list[SensorValue] = []
-    offset = _MULTI_HEADER_SIZE
-    for _ in range(value_count):
-        vtype, vfloat = struct.unpack_from(_VALUE_FMT, raw, offset)
-        values.append(SensorValue(type=vtype, value=vfloat))
-        offset += _VALUE_SIZE
+    # Decode every (type, value) pair with one C-level unpack call rather
+    # than a Python loop of per-value unpacks.
+    flat = _VALUES_UNPACK[value_count](raw, _MULTI_HEADER_SIZE)
+    # Pair them by zipping one iterator with itself (no slice copies).
+    pairs = iter(flat)
+    values = list(map(_make_sensor_value, zip(pairs, pairs)))
 
     return MultiSensorPacket(
         sync_word=sync,
@@ -224,34 +331,28 @@ def parse_multi_sensor(raw: bytes, rssi: Optional[float] = None,
         power_state=power_state,
         last_command_seq=last_cmd_seq,
         ack_status=ack_status,
-        location=location_b.rstrip(b"\x00").decode("utf-8", errors="replace"),
-        zone=zone_b.rstrip(b"\x00").decode("utf-8", errors="replace"),
+        # C strings: text ends at the first NUL, whatever follows it.
+        location=location_b.partition(b"\x00")[0].decode("utf-8", "replace"),
+        zone=zone_b.partition(b"\x00")[0].decode("utf-8", "replace"),
         values=values,
         rssi=rssi,
         snr=snr,
     )
 
 
-def parse_command(raw: bytes) -> Optional[CommandPacket]:
-    """
-    Deserialise a CommandPacket from *raw*.
-
-    Returns None on length, sync-word, or checksum failure.
-    """
+def _decode_command(raw: bytes) -> Optional[CommandPacket]:
+    """Validate length and CRC of a command frame and decode it."""
     if len(raw) < _CMD_SIZE:
         return None
     try:
         sync, cmd_type, target_id, seq, data_len, data_bytes, crc = \
-            struct.unpack_from(_CMD_FMT, raw, 0)
+            _CMD.unpack_from(raw, 0)
     except struct.error as exc:
         logger.warning("command packet unpack failed: %s", exc)
         return None
 
-    if sync != cfg.SYNC_COMMAND:
-        return None
-
     payload_end = _CMD_SIZE - 2
-    if _crc16(raw[:payload_end]) != crc:
+    if _crc16(raw, payload_end) != crc:
         logger.warning("CRC mismatch on command packet (type 0x%02X)", cmd_type)
         return None
 
@@ -265,26 +366,19 @@ def parse_command(raw: bytes) -> Optional[CommandPacket]:
     )
 
 
-def parse_ack(raw: bytes) -> Optional[AckPacket]:
-    """
-    Deserialise an AckPacket (CMD_ACK or CMD_NACK) from *raw*.
-
-    Returns None on failure.
-    """
+def _decode_ack(raw: bytes) -> Optional[AckPacket]:
+    """Validate length and CRC of an ACK/NACK frame and decode it."""
     if len(raw) < _ACK_SIZE:
         return None
     try:
         sync, cmd_type, sensor_id, seq, status, data_bytes, crc = \
-            struct.unpack_from(_ACK_FMT, raw, 0)
+            _ACK.unpack_from(raw, 0)
     except struct.error as exc:
         logger.warning("ack packet unpack failed: %s", exc)
         return None
 
-    if sync != cfg.SYNC_COMMAND:
-        return None
-
     payload_end = _ACK_SIZE - 2
-    if _crc16(raw[:payload_end]) != crc:
+    if _crc16(raw, payload_end) != crc:
         logger.warning("CRC mismatch on ACK packet from node %d", sensor_id)
         return None
 
@@ -299,23 +393,16 @@ def parse_ack(raw: bytes) -> Optional[AckPacket]:
     )
 
 
-def parse_legacy(raw: bytes, rssi: Optional[float] = None) -> Optional[LegacyPacket]:
-    """
-    Deserialise a legacy v1 SensorData packet from *raw*.
-
-    Legacy packets carry no checksum; the sync word is the only guard.
-    """
+def _decode_legacy(raw: bytes, rssi: Optional[float]) -> Optional[LegacyPacket]:
+    """Decode a legacy frame (no checksum to verify)."""
     if len(raw) < _LEGACY_SIZE:
         return None
     try:
         sync, sensor_id, network_id, temp, hum, batt, rssi_i, snr = \
-            struct.unpack_from(_LEGACY_FMT, raw, 0)
+            _LEGACY.unpack_from(raw, 0)
     except struct.error:
         return None
 
-    if sync != cfg.SYNC_LEGACY:
-        return None
-
     return LegacyPacket(
         sync_word=sync,
         sensor_id=sensor_id,
@@ -341,9 +428,7 @@ def build_command(command_type: int, target_id: int, seq: int,
     """
     if len(data) > 192:
         raise ValueError(f"command data too long ({len(data)} > 192 bytes)")
-    padded = data.ljust(192, b"\x00")
-    payload = struct.pack("<HBBBBx192s",
-                         cfg.SYNC_COMMAND, command_type, target_id, seq,
-                         len(data), padded)
-    crc = _crc16(payload)
-    return payload + struct.pack("<H", crc)
+    # "192s" zero-pads *data* itself.
+    payload = _CMD_PAYLOAD.pack(cfg.SYNC_COMMAND, command_type, target_id,
+                                seq, len(data), data)
+    return payload + _U16.pack(_crc16(payload))
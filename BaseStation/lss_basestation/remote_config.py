@@ -6,6 +6,9 @@ transmit loop.  Each command is retried up to COMMAND_RETRY_COUNT times
 before being marked as failed.  ACKs received from nodes (either as
 standalone AckPackets or piggybacked in MultiSensorHeader) clear the
 pending entry.
+
+Completed (acked or failed) commands leave the active queue at once, so
+the TX scans and API listings only ever walk live commands.
 """
 
 import logging
@@ -20,33 +23,48 @@ from .packet_parser import build_command
 
 logger = logging.getLogger(__name__)
 
+# Command payload layouts (little-endian), compiled once.
+_PACK_I = struct.Struct("<I")        # interval_ms
+_PACK_FF = struct.Struct("<ff")      # (low, high) / (low, critical)
+_PACK_IH = struct.Struct("<Ih")      # (utc_epoch, tz_offset_min)
+_PACK_FBBB = struct.Struct("<fBBB")  # (frequency, sf, bw, tx_power)
+_PACK_B = struct.Struct("<B")        # flag byte
+
 
 # ---------------------------------------------------------------------------
 # Data structures
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class PendingCommand:
     """A command awaiting delivery to a client node."""
     node_id: int
     command_type: int
     sequence_number: int
     data: bytes
-    enqueued_at: float = field(default_factory=time.time)
+    enqueued_at: float              # wall clock, for display
     attempts: int = 0
-    last_attempt_at: float = 0.0
+    last_attempt_at: float = 0.0    # time.monotonic(); immune to clock steps
     acked: bool = False
     failed: bool = False
+    _packet: Optional[bytes] = field(default=None, repr=False, compare=False)
 
     @property
     def raw_packet(self) -> bytes:
-        """Serialise to a ready-to-transmit CommandPacket."""
-        return build_command(
-            self.command_type,
-            self.node_id,
-            self.sequence_number,
-            self.data,
-        )
+        """
+        Serialise to a ready-to-transmit CommandPacket.
+
+        The frame is built (and its CRC computed) on first access only;
+        retries resend the same bytes.
+        """
+        if self._packet is None:
+            self._packet = build_command(
+                self.command_type,
+                self.node_id,
+                self.sequence_number,
+                self.data,
+            )
+        return self._packet
 
 
 # ---------------------------------------------------------------------------
@@ -61,9 +79,8 @@ class RemoteConfig:
 
         rc = RemoteConfig()
         rc.enqueue(node_id=3, command_type=CMD_PING)
-        # ... lora_manager calls rc.next_due() in its TX loop
-        cmd = rc.next_due()
-        if cmd:
+        # ... lora_manager calls rc.next_due_batch() in its TX loop
+        for cmd in rc.next_due_batch():
             radio.send(cmd.raw_packet)
             rc.mark_sent(cmd.sequence_number)
         # ... when ACK arrives:
@@ -72,11 +89,19 @@ class RemoteConfig:
 
     def __init__(self) -> None:
         self._lock = threading.Lock()
-        self._queue: list[PendingCommand] = []
+        self._active: list[PendingCommand] = []   # in enqueue order
+        self._done: list[PendingCommand] = []     # completed, until purged
+        # Sequence number → oldest queued (active or not yet purged)
+        # command with that number, so ACK and mark_sent lookups don't
+        # scan the queue.
+        self._by_seq: dict[int, PendingCommand] = {}
         self._seq: int = 1  # Start at 1; 0 is the sentinel for "no piggybacked ACK"
         # Optional callback invoked on command success/failure:
         # callback(node_id, seq, command_type, success)
         self._on_result: Optional[Callable[[int, int, int, bool], None]] = None
+        # Optional callback invoked (without the lock) after every enqueue,
+        # so the radio thread can wake up and transmit immediately.
+        self._on_enqueue: Optional[Callable[[], None]] = None
 
     # ------------------------------------------------------------------
     # Public interface
@@ -88,6 +113,10 @@ class RemoteConfig:
         """Set a callback invoked when a command succeeds or permanently fails."""
         self._on_result = cb
 
+    def set_enqueue_callback(self, cb: Callable[[], None]) -> None:
+        """Set a callback invoked after each command is enqueued."""
+        self._on_enqueue = cb
+
     def enqueue(self, node_id: int, command_type: int,
                 data: bytes = b"") -> int:
         """
@@ -95,6 +124,7 @@ class RemoteConfig:
 
         Returns the assigned sequence number for ACK correlation.
         """
+        now = time.time()
         with self._lock:
             seq = self._next_seq()
             cmd = PendingCommand(
@@ -102,11 +132,16 @@ class RemoteConfig:
                 command_type=command_type,
                 sequence_number=seq,
                 data=data,
+                enqueued_at=now,
             )
-            self._queue.append(cmd)
-            logger.debug("Enqueued %s → node %d (seq %d)",
-                         cfg.CMD_NAMES.get(command_type, f"0x{command_type:02X}"),
-                         node_id, seq)
+            self._active.append(cmd)
+            self._by_seq.setdefault(seq, cmd)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Enqueued %s → node %d (seq %d)",
+                             cfg.cmd_name(command_type),
+                             node_id, seq)
+        if self._on_enqueue:
+            self._on_enqueue()
         return seq
 
     def next_due(self) -> Optional[PendingCommand]:
@@ -119,36 +154,65 @@ class RemoteConfig:
           at least COMMAND_RETRY_TIMEOUT seconds have elapsed since the
           last attempt.
         """
-        now = time.time()
+        due = self.next_due_batch(max_n=1)
+        return due[0] if due else None
+
+    def next_due_batch(self, max_n: int = 100) -> list[PendingCommand]:
+        """
+        Return up to *max_n* commands that are due, in queue order.
+
+        One lock acquisition and one pass over the queue, however many
+        commands are due; see next_due() for the due rule.
+        """
+        now = time.monotonic()
+        due: list[PendingCommand] = []
         with self._lock:
-            for cmd in self._queue:
-                if cmd.acked or cmd.failed:
-                    continue
+            exhausted: list[PendingCommand] = []
+            for cmd in self._active:
                 if cmd.attempts == 0:
-                    return cmd
-                elapsed = now - cmd.last_attempt_at
-                if elapsed >= cfg.COMMAND_RETRY_TIMEOUT:
+                    due.append(cmd)
+                elif now - cmd.last_attempt_at >= cfg.COMMAND_RETRY_TIMEOUT:
                     if cmd.attempts >= cfg.COMMAND_RETRY_COUNT:
-                        cmd.failed = True
-                        logger.warning(
-                            "Command seq %d (type 0x%02X) to node %d "
-                            "exhausted all %d retries",
-                            cmd.sequence_number, cmd.command_type,
-                            cmd.node_id, cfg.COMMAND_RETRY_COUNT,
-                        )
-                        self._fire_result(cmd, success=False)
-                    else:
-                        return cmd
-        return None
+                        exhausted.append(cmd)
+                        continue
+                    due.append(cmd)
+                else:
+                    continue
+                if len(due) >= max_n:
+                    break
+            for cmd in exhausted:
+                cmd.failed = True
+                logger.warning(
+                    "Command seq %d (type 0x%02X) to node %d "
+                    "exhausted all %d retries",
+                    cmd.sequence_number, cmd.command_type,
+                    cmd.node_id, cfg.COMMAND_RETRY_COUNT,
+                )
+                self._retire_locked(cmd)
+                self._fire_result(cmd, success=False)
+        return due
+
+    def next_due_delay(self) -> Optional[float]:
+        """
+        Return seconds until the earliest active command is due (0 if one
+        is due now), or None if nothing is pending.
+        """
+        with self._lock:
+            return self._next_due_delay_locked(time.monotonic())
 
     def mark_sent(self, sequence_number: int) -> None:
         """Record that a transmission attempt was made."""
-        now = time.time()
+        now = time.monotonic()
         with self._lock:
             cmd = self._find_locked(sequence_number)
             if cmd:
                 cmd.attempts += 1
                 cmd.last_attempt_at = now
+                if cmd.node_id == cfg.NODE_ID_BROADCAST:
+                    # Every node ACKs a broadcast with its own id, so no ACK
+                    # can match it; one transmission is all it gets.
+                    cmd.acked = True
+                    self._retire_locked(cmd)
                 logger.debug("cmd seq %d attempt %d/%d",
                              sequence_number, cmd.attempts,
                              cfg.COMMAND_RETRY_COUNT)
@@ -164,6 +228,9 @@ class RemoteConfig:
             cmd = self._find_locked(sequence_number)
             if cmd is None or cmd.node_id != node_id:
                 return False
+            if cmd.acked or cmd.failed:
+                # Nodes repeat their last ACK in every telemetry packet.
+                return True
             if success:
                 cmd.acked = True
                 logger.info("Node %d ACKed command seq %d (type 0x%02X)",
@@ -172,6 +239,7 @@ class RemoteConfig:
                 cmd.failed = True
                 logger.warning("Node %d NACKed command seq %d (type 0x%02X)",
                                node_id, sequence_number, cmd.command_type)
+            self._retire_locked(cmd)
             self._fire_result(cmd, success=success)
             return True
 
@@ -188,10 +256,7 @@ class RemoteConfig:
     def pending_for_node(self, node_id: int) -> list[PendingCommand]:
         """Return all active (non-acked, non-failed) commands for *node_id*."""
         with self._lock:
-            return [
-                c for c in self._queue
-                if c.node_id == node_id and not c.acked and not c.failed
-            ]
+            return [c for c in self._active if c.node_id == node_id]
 
     def all_pending(self) -> list[dict]:
         """Return a summary list of all active commands (for the API)."""
@@ -200,25 +265,26 @@ class RemoteConfig:
                 {
                     "node_id": c.node_id,
                     "command_type": c.command_type,
-                    "command_name": cfg.CMD_NAMES.get(
-                        c.command_type, f"0x{c.command_type:02X}"
-                    ),
+                    "command_name": cfg.cmd_name(c.command_type),
                     "sequence_number": c.sequence_number,
                     "attempts": c.attempts,
                     "acked": c.acked,
                     "failed": c.failed,
                     "enqueued_at": c.enqueued_at,
                 }
-                for c in self._queue
-                if not c.acked and not c.failed
+                for c in self._active
             ]
 
     def purge_completed(self) -> int:
-        """Remove all acked/failed entries from the queue.  Returns count removed."""
+        """Drop all acked/failed entries.  Returns count removed."""
         with self._lock:
-            before = len(self._queue)
-            self._queue = [c for c in self._queue if not c.acked and not c.failed]
-            return before - len(self._queue)
+            removed = len(self._done)
+            if removed:
+                self._done = []
+                self._by_seq = {}
+                for cmd in self._active:
+                    self._by_seq.setdefault(cmd.sequence_number, cmd)
+            return removed
 
     # ------------------------------------------------------------------
     # Command factory helpers
@@ -230,7 +296,7 @@ class RemoteConfig:
 
     def enqueue_set_interval(self, node_id: int, interval_ms: int) -> int:
         """Queue CMD_SET_INTERVAL with a 4-byte little-endian interval."""
-        data = struct.pack("<I", interval_ms)
+        data = _PACK_I.pack(interval_ms)
         return self.enqueue(node_id, cfg.CMD_SET_INTERVAL, data)
 
     def enqueue_set_location(self, node_id: int, location: str,
@@ -243,21 +309,27 @@ class RemoteConfig:
     def enqueue_set_temp_thresh(self, node_id: int, low: float,
                                 high: float) -> int:
         """Queue CMD_SET_TEMP_THRESH with two 4-byte floats (low, high)."""
-        data = struct.pack("<ff", low, high)
+        data = _PACK_FF.pack(low, high)
         return self.enqueue(node_id, cfg.CMD_SET_TEMP_THRESH, data)
 
     def enqueue_set_battery_thresh(self, node_id: int, low: float,
                                    critical: float) -> int:
         """Queue CMD_SET_BATTERY_THRESH with two 4-byte floats (low, critical)."""
-        data = struct.pack("<ff", low, critical)
+        data = _PACK_FF.pack(low, critical)
         return self.enqueue(node_id, cfg.CMD_SET_BATTERY_THRESH, data)
 
     def enqueue_time_sync(self, node_id: int, utc_epoch: int,
                           tz_offset_min: int) -> int:
         """Queue CMD_TIME_SYNC with epoch (uint32) and tz offset (int16)."""
-        data = struct.pack("<Ih", utc_epoch, tz_offset_min)
+        data = _PACK_IH.pack(utc_epoch, tz_offset_min)
         return self.enqueue(node_id, cfg.CMD_TIME_SYNC, data)
 
+    def enqueue_time_sync_broadcast(self, utc_epoch: int,
+                                    tz_offset_min: int) -> int:
+        """Queue a single CMD_TIME_SYNC addressed to every node (sent once)."""
+        return self.enqueue_time_sync(cfg.NODE_ID_BROADCAST, utc_epoch,
+                                      tz_offset_min)
+
     def enqueue_restart(self, node_id: int) -> int:
         """Queue CMD_RESTART."""
         return self.enqueue(node_id, cfg.CMD_RESTART)
@@ -269,18 +341,18 @@ class RemoteConfig:
     def enqueue_base_welcome(self, node_id: int, utc_epoch: int,
                              tz_offset_min: int) -> int:
         """Queue CMD_BASE_WELCOME (time sync + base config) for a new node."""
-        data = struct.pack("<Ih", utc_epoch, tz_offset_min)
+        data = _PACK_IH.pack(utc_epoch, tz_offset_min)
         return self.enqueue(node_id, cfg.CMD_BASE_WELCOME, data)
 
     def enqueue_set_lora_params(self, node_id: int, frequency: float,
                                 sf: int, bw: int, tx_power: int) -> int:
         """Queue CMD_SET_LORA_PARAMS."""
-        data = struct.pack("<fBBB", frequency, sf, 0, tx_power)
+        data = _PACK_FBBB.pack(frequency, sf, 0, tx_power)
         return self.enqueue(node_id, cfg.CMD_SET_LORA_PARAMS, data)
 
     def enqueue_set_mesh_config(self, node_id: int, enabled: bool) -> int:
         """Queue CMD_SET_MESH_CONFIG with a single byte flag."""
-        data = struct.pack("<B", 1 if enabled else 0)
+        data = _PACK_B.pack(1 if enabled else 0)
         return self.enqueue(node_id, cfg.CMD_SET_MESH_CONFIG, data)
 
     # ------------------------------------------------------------------
@@ -293,12 +365,28 @@ class RemoteConfig:
         self._seq = (self._seq + 1) % 256
         return seq
 
+    def _next_due_delay_locked(self, now: float) -> Optional[float]:
+        """
+        Seconds until the earliest active command is due (0 if one is due
+        now), or None if nothing is pending (must hold _lock).
+        """
+        delay: Optional[float] = None
+        for cmd in self._active:
+            if cmd.attempts == 0:
+                return 0.0
+            remaining = cmd.last_attempt_at + cfg.COMMAND_RETRY_TIMEOUT - now
+            if delay is None or remaining < delay:
+                delay = remaining
+        return None if delay is None else max(0.0, delay)
+
     def _find_locked(self, seq: int) -> Optional[PendingCommand]:
         """Locate a command by sequence number (must hold _lock)."""
-        for cmd in self._queue:
-            if cmd.sequence_number == seq:
-                return cmd
-        return None
+        return self._by_seq.get(seq)
+
+    def _retire_locked(self, cmd: PendingCommand) -> None:
+        """Move *cmd* from the active queue to the done list (must hold _lock)."""
+        self._active.remove(cmd)
+        self._done.append(cmd)
 
     def _fire_result(self, cmd: PendingCommand, success: bool) -> None:
         """Invoke the result callback if registered (must hold _lock)."""
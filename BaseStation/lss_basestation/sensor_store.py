@@ -3,30 +3,190 @@ sensor_store.py — In-memory sensor state and SQLite time-series history.
 
 Each node's last known state is cached in memory.  Every incoming telemetry
 packet is also written to the SQLite database for historical queries and
-dashboard charts.
+dashboard charts.  Rows are buffered and written by a background thread in
+one transaction per batch (at most _HISTORY_FLUSH_INTERVAL seconds apart),
+so fsync cost is shared across packets; history queries flush first.
 
-A background thread marks nodes offline after NODE_OFFLINE_TIMEOUT seconds.
+A background thread marks nodes offline after NODE_OFFLINE_TIMEOUT seconds,
+sleeping until the earliest pending deadline in a heap fed by ingestion.
 """
 
+import atexit
+import heapq
+import itertools
+import json
 import logging
+import math
+import os
+import queue
 import sqlite3
 import threading
 import time
+from array import array
 from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from types import MappingProxyType
+from typing import Any, Iterable, Iterator, Mapping, NamedTuple, Optional
+from urllib.parse import quote
 
 from . import config as cfg
 from .packet_parser import MultiSensorPacket, LegacyPacket, SensorValue
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson  # type: ignore
+
+    def _dumps(values: dict[int, float]) -> str:
+        return orjson.dumps(values, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(values: dict[int, float]) -> str:
+        # Integer keys become strings, as with orjson.OPT_NON_STR_KEYS.
+        return json.dumps(values, separators=(",", ":"))
+
+    _loads = json.loads
+
+# Node state is guarded by one of _LOCK_SHARDS locks chosen by node id, so
+# ingesting for one node never waits on readers or writers of another.
+_LOCK_SHARDS = 64
+
+# Buffered history rows are written at least this often (seconds), or as
+# soon as _HISTORY_BATCH rows are waiting.
+_HISTORY_FLUSH_INTERVAL = 1.0
+_HISTORY_BATCH = 500
+# If the disk stalls, at most this many rows wait in memory; beyond that the
+# oldest are dropped (and counted) rather than blocking the radio thread.
+_HISTORY_QUEUE_MAX = 10_000
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    # With WAL, NORMAL only syncs at checkpoints; a power cut can lose the
+    # last transactions but never corrupts the database.
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",         # KiB, i.e. ~20 MB of page cache
+    "PRAGMA mmap_size=268435456",       # read pages via a 256 MB mapping
+    "PRAGMA wal_autocheckpoint=1000",   # pages; keeps the WAL file bounded
+)
+
+# History queries run on up to this many pooled read-only connections, so
+# they neither wait for nor block the writer (WAL allows both at once).
+_READERS = 4
+_READER_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Selectable columns for get_history(fields=...), in response order.
+HISTORY_FIELDS = ("battery_percent", "rssi", "snr", "values")
+
+_BUCKET = "CAST(timestamp / ? AS INTEGER) * ?"
+_BUCKET_VALUES = (
+    f"SELECT {_BUCKET} AS b, j.key, AVG(j.value) "
+    "FROM sensor_history, json_each(values_json) AS j "
+    "WHERE node_id = ? AND timestamp >= ? AND timestamp < ? "
+    "GROUP BY b, j.key"
+)
+
+
+@lru_cache(maxsize=None)
+def _history_sql(metrics: tuple[str, ...], with_values: bool,
+                 bucketed: bool) -> str:
+    """History SELECT for one field combination, built once and reused."""
+    if bucketed:
+        avgs = "".join(f", AVG({m})" for m in metrics)
+        return (f"SELECT {_BUCKET} AS b{avgs} FROM sensor_history "
+                "WHERE node_id = ? AND timestamp >= ? "
+                "GROUP BY b ORDER BY b ASC LIMIT ?")
+    cols = ", ".join(("timestamp", *metrics))
+    return (f"SELECT {cols}{', values_json' if with_values else ''} "
+            "FROM sensor_history "
+            "WHERE node_id = ? AND timestamp >= ? "
+            "ORDER BY timestamp ASC LIMIT ?")
+
+
+_INSERT_HISTORY = (
+    "INSERT INTO sensor_history "
+    "(node_id, timestamp, battery_percent, rssi, snr, values_json) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
 
 # ---------------------------------------------------------------------------
 # Data structures
 # ---------------------------------------------------------------------------
 
-@dataclass
+class HistoryRing:
+    """
+    Fixed-size ring of recent (timestamp, battery, RSSI, SNR) samples.
+
+    Kept as parallel typed arrays rather than a deque of objects: about
+    17 bytes per slot, preallocated, with no per-sample allocation.  A
+    missing RSSI/SNR is stored as NaN.
+    """
+    __slots__ = ("ts", "battery", "rssi", "snr", "head", "count")
+
+    def __init__(self, size: Optional[int] = None) -> None:
+        size = size or cfg.MAX_HISTORY_POINTS
+        self.ts = array("d", [0.0]) * size
+        self.battery = array("B", [0]) * size
+        self.rssi = array("f", [0.0]) * size
+        self.snr = array("f", [0.0]) * size
+        self.head = 0           # slot the next sample is written to
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, ts: float, battery: int, rssi: Optional[float],
+               snr: Optional[float]) -> None:
+        i = self.head
+        self.ts[i] = ts
+        self.battery[i] = battery
+        self.rssi[i] = math.nan if rssi is None else rssi
+        self.snr[i] = math.nan if snr is None else snr
+        self.head = (i + 1) % len(self.ts)
+        if self.count < len(self.ts):
+            self.count += 1
+
+    def samples(self) -> list[tuple[float, int, Optional[float], Optional[float]]]:
+        """Return the stored samples oldest-first."""
+        size = len(self.ts)
+        start = (self.head - self.count) % size
+        order = [(start + k) % size for k in range(self.count)]
+        return [
+            (self.ts[i], self.battery[i],
+             None if math.isnan(self.rssi[i]) else self.rssi[i],
+             None if math.isnan(self.snr[i]) else self.snr[i])
+            for i in order
+        ]
+
+
+class NodeSnapshot(NamedTuple):
+    """
+    Immutable copy of a NodeState (minus history) handed to readers.
+
+    Snapshots are cached on the node until it next changes, so several
+    readers may share one; ``values`` is therefore a read-only view.
+    """
+    node_id: int
+    location: str
+    zone: str
+    battery_percent: int
+    power_state: int
+    rssi: Optional[float]
+    snr: Optional[float]
+    last_seen: float
+    online: bool
+    values: Mapping[int, float]
+
+
+@dataclass(slots=True)
 class NodeState:
     """Last-known state for a single sensor node."""
     node_id: int
@@ -40,17 +200,10 @@ class NodeState:
     online: bool = False
     values: dict[int, float] = field(default_factory=dict)  # type → value
     # Ring buffer of recent readings for sparkline charts
-    history: deque = field(default_factory=lambda: deque(maxlen=cfg.MAX_HISTORY_POINTS))
-
-
-@dataclass
-class HistoryPoint:
-    """One time-series sample stored in memory and SQLite."""
-    timestamp: float
-    battery_percent: int
-    rssi: Optional[float]
-    snr: Optional[float]
-    values: dict[int, float]        # type → value
+    history: HistoryRing = field(default_factory=HistoryRing)
+    # Cached NodeSnapshot; reset to None whenever any field above changes.
+    snapshot: Optional[NodeSnapshot] = field(default=None, repr=False,
+                                             compare=False)
 
 
 # ---------------------------------------------------------------------------
@@ -63,15 +216,42 @@ class SensorStore:
 
     Nodes are created automatically on first telemetry receipt.  Up to
     MAX_NODES nodes are tracked; additional nodes are logged and ignored.
+    With ``start_watchdog=False`` nodes are never marked offline by the
+    background thread (tests drive ``_mark_offline`` directly).
     """
 
-    def __init__(self, db_path: str = cfg.DB_PATH) -> None:
+    def __init__(self, db_path: str = cfg.DB_PATH,
+                 start_watchdog: bool = True) -> None:
         self._db_path = db_path
-        self._lock = threading.Lock()
+        self._shards = tuple(threading.Lock() for _ in range(_LOCK_SHARDS))
+        self._dir_lock = threading.Lock()       # guards adding to _nodes
         self._nodes: dict[int, NodeState] = {}
+        # Bumped after every node-state change; see the ``version`` property.
+        # next() on a count is atomic, so values are never reused even when
+        # two shards race (at worst the later value is stored first).
+        self._changes = itertools.count(1)
+        self._version = 0
         self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()        # serialises use of _db
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue(_READERS)
+        # History rows waiting for the writer thread.
+        self._pending: deque[tuple[Any, ...]] = deque(maxlen=_HISTORY_QUEUE_MAX)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._wake = threading.Event()
+        # Min-heap of (offline deadline, node_id), one entry per packet.
+        self._timeouts: list[tuple[float, int]] = []
+        self._timeout_lock = threading.Lock()
+        self._timeout_wake = threading.Event()
+        self._watchdog_enabled = False  # nothing pops _timeouts without it
+        self._closed = False
         self._init_db()
-        self._start_watchdog()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True,
+                                        name="history-writer")
+        self._writer.start()
+        atexit.register(self.close)
+        if start_watchdog:
+            self._start_watchdog()
 
     # ------------------------------------------------------------------
     # Public interface — ingestion
@@ -83,10 +263,10 @@ class SensorStore:
         if nid == cfg.BASE_STATION_ID or nid == cfg.NODE_ID_BROADCAST:
             logger.debug("dropping packet from reserved node ID %d", nid)
             return
-        with self._lock:
-            node = self._get_or_create_locked(nid)
-            if node is None:
-                return
+        node = self._get_or_create(nid)
+        if node is None:
+            return
+        with self._shard_for(nid):
             node.location = packet.location or node.location
             node.zone = packet.zone or node.zone
             node.battery_percent = packet.battery_percent
@@ -97,25 +277,24 @@ class SensorStore:
             node.online = True
             for sv in packet.values:
                 node.values[sv.type] = sv.value
-            point = HistoryPoint(
-                timestamp=node.last_seen,
-                battery_percent=node.battery_percent,
-                rssi=node.rssi,
-                snr=node.snr,
-                values=dict(node.values),
-            )
-            node.history.append(point)
-        self._write_history(nid, point)
+            node.history.append(node.last_seen, node.battery_percent,
+                                node.rssi, node.snr)
+            row = (nid, node.last_seen, node.battery_percent, node.rssi,
+                   node.snr, _dumps(node.values))
+            node.snapshot = None
+            self._version = next(self._changes)
+        self._schedule_timeout(nid, row[1])
+        self._write_history(row)
 
     def ingest_legacy(self, packet: LegacyPacket,
                       rssi: Optional[float] = None,
                       snr: Optional[float] = None) -> None:
         """Record a legacy v1 SensorData packet."""
         nid = packet.sensor_id
-        with self._lock:
-            node = self._get_or_create_locked(nid)
-            if node is None:
-                return
+        node = self._get_or_create(nid)
+        if node is None:
+            return
+        with self._shard_for(nid):
             node.battery_percent = packet.battery_percent
             node.rssi = rssi if rssi is not None else float(packet.rssi)
             node.snr = snr if snr is not None else packet.snr
@@ -123,122 +302,254 @@ class SensorStore:
             node.online = True
             node.values[cfg.VALUE_TEMPERATURE] = packet.temperature
             node.values[cfg.VALUE_HUMIDITY] = packet.humidity
-            point = HistoryPoint(
-                timestamp=node.last_seen,
-                battery_percent=node.battery_percent,
-                rssi=node.rssi,
-                snr=node.snr,
-                values=dict(node.values),
-            )
-            node.history.append(point)
-        self._write_history(nid, point)
+            node.history.append(node.last_seen, node.battery_percent,
+                                node.rssi, node.snr)
+            row = (nid, node.last_seen, node.battery_percent, node.rssi,
+                   node.snr, _dumps(node.values))
+            node.snapshot = None
+            self._version = next(self._changes)
+        self._schedule_timeout(nid, row[1])
+        self._write_history(row)
 
     # ------------------------------------------------------------------
     # Public interface — queries
     # ------------------------------------------------------------------
 
-    def get_node(self, node_id: int) -> Optional[NodeState]:
+    def get_node(self, node_id: int) -> Optional[NodeSnapshot]:
         """Return a snapshot of a node's current state, or None."""
-        with self._lock:
-            node = self._nodes.get(node_id)
-            if node is None:
-                return None
-            # Return a shallow copy to avoid external mutation
-            snap = NodeState(
-                node_id=node.node_id,
-                location=node.location,
-                zone=node.zone,
-                battery_percent=node.battery_percent,
-                power_state=node.power_state,
-                rssi=node.rssi,
-                snr=node.snr,
-                last_seen=node.last_seen,
-                online=node.online,
-                values=dict(node.values),
-            )
+        node = self._nodes.get(node_id)
+        if node is None:
+            return None
+        # A cached snapshot is immutable and safe to hand out without the
+        # lock; at worst it predates an ingest that is still in progress.
+        snap = node.snapshot
+        if snap is not None:
             return snap
+        with self._shard_for(node_id):
+            return self._snapshot_locked(node)
 
-    def get_all_nodes(self) -> list[NodeState]:
+    def get_all_nodes(self) -> list[NodeSnapshot]:
         """Return snapshots of all tracked nodes."""
-        with self._lock:
-            return [
-                NodeState(
-                    node_id=n.node_id,
-                    location=n.location,
-                    zone=n.zone,
-                    battery_percent=n.battery_percent,
-                    power_state=n.power_state,
-                    rssi=n.rssi,
-                    snr=n.snr,
-                    last_seen=n.last_seen,
-                    online=n.online,
-                    values=dict(n.values),
-                )
-                for n in self._nodes.values()
-            ]
+        snaps = []
+        for node in list(self._nodes.values()):
+            snap = node.snapshot            # see get_node()
+            if snap is None:
+                with self._shard_for(node.node_id):
+                    snap = self._snapshot_locked(node)
+            snaps.append(snap)
+        return snaps
 
     def get_history(self, node_id: int, limit: int = 100,
-                    since: float = 0.0) -> list[dict[str, Any]]:
+                    since: float = 0.0, bucket_seconds: float = 0,
+                    fields: Optional[Iterable[str]] = None,
+                    ) -> list[dict[str, Any]]:
         """
         Return time-series rows for *node_id* from SQLite.
 
         Rows are ordered oldest-first.  *since* is a Unix timestamp;
-        *limit* caps the number of returned rows.
+        *limit* caps the number of returned rows.  *fields* selects which
+        of battery_percent/rssi/snr/values to return (default: all) —
+        leaving out ``values`` skips JSON decoding altogether.  With
+        *bucket_seconds* > 0 SQLite averages each field over buckets of
+        that width and each row's timestamp is its bucket start.
         """
         if self._db is None:
             return []
+        wanted = [f for f in HISTORY_FIELDS if fields is None or f in fields]
+        metrics = tuple(f for f in wanted if f != "values")
+        with_values = "values" in wanted
+        self.flush()
         try:
-            cur = self._db.execute(
-                "SELECT timestamp, battery_percent, rssi, snr, values_json "
-                "FROM sensor_history "
-                "WHERE node_id = ? AND timestamp >= ? "
-                "ORDER BY timestamp ASC LIMIT ?",
-                (node_id, since, limit),
-            )
-            rows = []
-            for ts, batt, rssi, snr, values_json in cur.fetchall():
-                import json
-                rows.append({
-                    "timestamp": ts,
-                    "battery_percent": batt,
-                    "rssi": rssi,
-                    "snr": snr,
-                    "values": json.loads(values_json) if values_json else {},
-                })
-            return rows
+            with self._reader() as conn:
+                if bucket_seconds > 0:
+                    return self._history_buckets(conn, node_id, limit, since,
+                                                 bucket_seconds, metrics,
+                                                 with_values)
+                return self._history_rows(conn, node_id, limit, since,
+                                          metrics, with_values)
         except sqlite3.Error as exc:
             logger.error("history query failed: %s", exc)
             return []
 
+    @property
+    def version(self) -> int:
+        """
+        Change counter for node state (not history).
+
+        Changes whenever any snapshot returned by get_all_nodes() would,
+        so callers can cache anything derived from the snapshots under it.
+        Read it *before* taking the snapshots.
+        """
+        return self._version
+
+    @property
+    def history_dropped(self) -> int:
+        """Number of history rows dropped because the write queue was full."""
+        return self._dropped
+
     def node_count(self) -> int:
         """Return the number of currently-tracked nodes."""
-        with self._lock:
-            return len(self._nodes)
+        return len(self._nodes)
+
+    def flush(self) -> None:
+        """Write all buffered history rows now, in one transaction."""
+        if self._db is None or not self._pending:
+            return
+        with self._db_lock:
+            pending = self._pending
+            rows = [pending.popleft() for _ in range(len(pending))]
+            if not rows:
+                return
+            try:
+                with self._db:      # commits, or rolls back on error
+                    self._db.execute("BEGIN")
+                    self._db.executemany(_INSERT_HISTORY, rows)
+            except sqlite3.Error as exc:
+                logger.error("Failed to write %d history rows: %s",
+                             len(rows), exc)
+
+    def close(self) -> None:
+        """Stop the history writer and flush any buffered rows."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._timeout_wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
-    def _get_or_create_locked(self, node_id: int) -> Optional[NodeState]:
-        """Return or create a NodeState.  Must be called with _lock held."""
-        if node_id in self._nodes:
-            return self._nodes[node_id]
-        if len(self._nodes) >= cfg.MAX_NODES:
-            logger.warning("MAX_NODES (%d) reached; ignoring node %d",
-                           cfg.MAX_NODES, node_id)
-            return None
-        node = NodeState(node_id=node_id)
-        self._nodes[node_id] = node
+    def _shard_for(self, node_id: int) -> threading.Lock:
+        """Return the lock guarding *node_id*'s NodeState."""
+        return self._shards[node_id % _LOCK_SHARDS]
+
+    def _get_or_create(self, node_id: int) -> Optional[NodeState]:
+        """Return or create a NodeState (None once MAX_NODES is reached)."""
+        node = self._nodes.get(node_id)
+        if node is not None:
+            return node
+        with self._dir_lock:
+            node = self._nodes.get(node_id)
+            if node is not None:
+                return node
+            if len(self._nodes) >= cfg.MAX_NODES:
+                logger.warning("MAX_NODES (%d) reached; ignoring node %d",
+                               cfg.MAX_NODES, node_id)
+                return None
+            node = NodeState(node_id=node_id)
+            self._nodes[node_id] = node
         logger.info("Registered new node %d", node_id)
         return node
 
+    @staticmethod
+    def _snapshot_locked(node: NodeState) -> NodeSnapshot:
+        """Return *node*'s snapshot, rebuilding it if stale (hold its lock)."""
+        snap = node.snapshot
+        if snap is None:
+            # A NamedTuple is ~2.5x cheaper to build than a NodeState, whose
+            # __init__ would also allocate a fresh history ring per call.
+            snap = node.snapshot = NodeSnapshot(
+                node.node_id, node.location, node.zone, node.battery_percent,
+                node.power_state, node.rssi, node.snr, node.last_seen,
+                node.online, MappingProxyType(dict(node.values)),
+            )
+        return snap
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled read-only connection (or the writer's, locked)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._open_reader()
+        if conn is None:
+            with self._db_lock:
+                yield self._db
+            return
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _open_reader(self) -> Optional[sqlite3.Connection]:
+        """Open a read-only connection to the history database."""
+        uri = "file:" + quote(os.path.abspath(self._db_path)) + "?mode=ro"
+        try:
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            for pragma in _READER_PRAGMAS:
+                conn.execute(pragma)
+            return conn
+        except sqlite3.Error as exc:
+            logger.warning("read-only connection failed (%s); "
+                           "querying on the writer connection", exc)
+            return None
+
+    @staticmethod
+    def _history_rows(conn: sqlite3.Connection, node_id: int, limit: int,
+                      since: float, metrics: tuple[str, ...],
+                      with_values: bool) -> list[dict[str, Any]]:
+        """Raw history rows."""
+        cols = ("timestamp", *metrics)
+        fetched = conn.execute(
+            _history_sql(metrics, with_values, False),
+            (node_id, since, limit),
+        ).fetchall()
+        if not with_values:
+            return [dict(zip(cols, row)) for row in fetched]
+        rows = []
+        for row in fetched:
+            d = dict(zip(cols, row))
+            d["values"] = _loads(row[-1]) if row[-1] else {}
+            rows.append(d)
+        return rows
+
+    @staticmethod
+    def _history_buckets(conn: sqlite3.Connection, node_id: int, limit: int,
+                         since: float, width: float, metrics: tuple[str, ...],
+                         with_values: bool) -> list[dict[str, Any]]:
+        """History averaged into *width*-second buckets."""
+        fetched = conn.execute(
+            _history_sql(metrics, False, True),
+            (width, width, node_id, since, limit),
+        ).fetchall()
+        cols = ("timestamp", *metrics)
+        rows = [dict(zip(cols, row)) for row in fetched]
+        if with_values and rows:
+            # Average each value type per bucket inside SQLite (JSON1), so
+            # no per-sample JSON is decoded in Python.
+            by_bucket = {row["timestamp"]: row for row in rows}
+            for row in rows:
+                row["values"] = {}
+            for b, key, avg in conn.execute(
+                _BUCKET_VALUES,
+                (width, width, node_id, since,
+                 rows[-1]["timestamp"] + width),
+            ):
+                row = by_bucket.get(b)
+                if row is not None:
+                    row["values"][key] = avg
+        return rows
+
     def _init_db(self) -> None:
         """Open (or create) the SQLite database and create the schema."""
-        import os
         os.makedirs(os.path.dirname(self._db_path), exist_ok=True)
         try:
-            self._db = sqlite3.connect(self._db_path, check_same_thread=False)
-            self._db.execute("PRAGMA journal_mode=WAL")
+            # Autocommit mode: flush() opens its own transaction per batch.
+            self._db = sqlite3.connect(self._db_path, check_same_thread=False,
+                                       isolation_level=None)
+            for pragma in _PRAGMAS:
+                self._db.execute(pragma)
             self._db.execute(
                 """
                 CREATE TABLE IF NOT EXISTS sensor_history (
@@ -252,9 +563,14 @@ class SensorStore:
                 )
                 """
             )
+            # Covering index: metric-only and bucketed history queries are
+            # answered from the index without touching the table.  It
+            # supersedes the older (node_id, timestamp) index.
+            self._db.execute("DROP INDEX IF EXISTS idx_node_ts")
             self._db.execute(
-                "CREATE INDEX IF NOT EXISTS idx_node_ts "
-                "ON sensor_history (node_id, timestamp)"
+                "CREATE INDEX IF NOT EXISTS idx_node_ts_metrics "
+                "ON sensor_history (node_id, timestamp, battery_percent, "
+                "rssi, snr)"
             )
             self._db.commit()
             logger.info("SQLite database opened at %s", self._db_path)
@@ -262,43 +578,75 @@ class SensorStore:
             logger.error("Failed to open SQLite database: %s", exc)
             self._db = None
 
-    def _write_history(self, node_id: int, point: HistoryPoint) -> None:
-        """Persist a HistoryPoint to SQLite (best-effort)."""
+    def _write_history(self, row: tuple[Any, ...]) -> None:
+        """Queue an _INSERT_HISTORY row for the writer thread (best-effort)."""
         if self._db is None:
             return
-        import json
-        try:
-            self._db.execute(
-                "INSERT INTO sensor_history "
-                "(node_id, timestamp, battery_percent, rssi, snr, values_json) "
-                "VALUES (?, ?, ?, ?, ?, ?)",
-                (
-                    node_id,
-                    point.timestamp,
-                    point.battery_percent,
-                    point.rssi,
-                    point.snr,
-                    json.dumps({str(k): v for k, v in point.values.items()}),
-                ),
-            )
-            self._db.commit()
-        except sqlite3.Error as exc:
-            logger.error("Failed to write history for node %d: %s", node_id, exc)
+        if len(self._pending) == self._pending.maxlen:
+            with self._dropped_lock:
+                self._dropped += 1
+            if self._dropped == 1 or self._dropped % 1000 == 0:
+                logger.warning("History queue full; dropped %d row(s) so far",
+                               self._dropped)
+        self._pending.append(row)       # evicts the oldest row when full
+        if len(self._pending) >= _HISTORY_BATCH:
+            self._wake.set()
+
+    def _writer_loop(self) -> None:
+        """Background thread: flush buffered history rows in batches."""
+        while not self._closed:
+            self._wake.wait(_HISTORY_FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
 
     def _start_watchdog(self) -> None:
         """Start a daemon thread that marks nodes offline after idle timeout."""
+        self._watchdog_enabled = True
         t = threading.Thread(target=self._watchdog_loop, daemon=True,
                              name="sensor-watchdog")
         t.start()
 
+    def _schedule_timeout(self, node_id: int, last_seen: float) -> None:
+        """Queue the deadline at which *node_id* goes offline if silent."""
+        if not self._watchdog_enabled:
+            return
+        with self._timeout_lock:
+            was_empty = not self._timeouts
+            heapq.heappush(self._timeouts,
+                           (last_seen + cfg.NODE_OFFLINE_TIMEOUT, node_id))
+        # Later packets only ever push later deadlines, so the watchdog's
+        # sleep needs cutting short only when it had nothing to wait for.
+        if was_empty:
+            self._timeout_wake.set()
+
     def _watchdog_loop(self) -> None:
-        """Periodically scan nodes and transition them to offline."""
-        while True:
-            time.sleep(30)
-            now = time.time()
-            with self._lock:
-                for node in self._nodes.values():
-                    if node.online and (now - node.last_seen) > cfg.NODE_OFFLINE_TIMEOUT:
-                        node.online = False
-                        logger.info("Node %d marked offline (last seen %.0f s ago)",
-                                    node.node_id, now - node.last_seen)
+        """Sleep until the earliest offline deadline, then expire nodes."""
+        while not self._closed:
+            with self._timeout_lock:
+                delay = (self._timeouts[0][0] - time.time()
+                         if self._timeouts else None)
+            if delay is None or delay > 0:
+                self._timeout_wake.wait(delay)
+                self._timeout_wake.clear()
+                continue
+            self._mark_offline(time.time())
+
+    def _mark_offline(self, now: float) -> None:
+        """Mark nodes whose offline deadline has passed as offline."""
+        due = []
+        with self._timeout_lock:
+            while self._timeouts and self._timeouts[0][0] < now:
+                due.append(heapq.heappop(self._timeouts)[1])
+        for nid in due:
+            node = self._nodes.get(nid)
+            if node is None:
+                continue
+            with self._shard_for(nid):
+                # Stale entry if the node was heard from since: its newer
+                # packet queued a later deadline.
+                if node.online and (now - node.last_seen) > cfg.NODE_OFFLINE_TIMEOUT:
+                    node.online = False
+                    node.snapshot = None
+                    self._version = next(self._changes)
+                    logger.info("Node %d marked offline (last seen %.0f s ago)",
+                                node.node_id, now - node.last_seen)
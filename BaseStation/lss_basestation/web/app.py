@@ -5,14 +5,15 @@ All mutable state is injected via the ``create_app`` factory so that
 the application can be tested without a running radio.
 """
 
+import json
 import logging
+import os
 import time
-from datetime import datetime
 from functools import wraps
 from typing import Any
 
 from flask import (
-    Flask, request, jsonify, render_template,
+    Flask, Response, request, jsonify, render_template,
     session, redirect, url_for, abort,
 )
 
@@ -25,6 +26,28 @@ from ..alerts import AlertManager
 
 logger = logging.getLogger(__name__)
 
+# Prefixes /api/sensors ETags.  The store version restarts at 0 with the
+# process, so without it a browser could revalidate a tag from before a
+# restart against unrelated new data.
+_BOOT_ID = os.urandom(4).hex()
+
+try:
+    import orjson  # type: ignore
+
+    # default=dict encodes read-only mapping views (e.g. snapshot values).
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=dict,
+                            option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=dict,
+                          separators=(",", ":")).encode("utf-8")
+
+
+def _json(obj: Any) -> Response:
+    """JSON response encoded straight to bytes (orjson when available)."""
+    return Response(_dumps(obj), mimetype="application/json")
+
 
 # ---------------------------------------------------------------------------
 # Application factory
@@ -89,13 +112,20 @@ def create_app(
     # Dashboard
     # ------------------------------------------------------------------
 
+    # [store version, rendered HTML] of the last dashboard page.  The page
+    # depends only on node state, so every tab shares one render per change.
+    dashboard_cache: list[Any] = [None, ""]
+
     @app.route("/")
     @login_required
     def dashboard():
         store: SensorStore = app.config["STORE"]
-        nodes = store.get_all_nodes()
+        version = store.version         # read before snapshotting
+        cached_version, html = dashboard_cache
+        if cached_version == version:
+            return html
         nodes_data = []
-        for n in nodes:
+        for n in store.get_all_nodes():
             d = {
                 "node_id": n.node_id,
                 "location": n.location,
@@ -106,46 +136,59 @@ def create_app(
                 "snr": n.snr,
                 "online": n.online,
                 "last_seen": (
-                    datetime.fromtimestamp(n.last_seen).strftime("%Y-%m-%d %H:%M:%S")
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(n.last_seen))
                     if n.last_seen else "never"
                 ),
                 "values": {
-                    cfg.VALUE_NAMES.get(k, str(k)): {
+                    cfg.value_name(k) or str(k): {
                         "value": round(v, 2),
-                        "unit": cfg.VALUE_UNITS.get(k, ""),
+                        "unit": cfg.value_unit(k),
                     }
                     for k, v in n.values.items()
                 },
             }
             nodes_data.append(d)
-        return render_template("dashboard.html", nodes=nodes_data)
+        html = render_template("dashboard.html", nodes=nodes_data)
+        dashboard_cache[:] = (version, html)
+        return html
 
     # ------------------------------------------------------------------
     # API — sensors
     # ------------------------------------------------------------------
 
+    # [store version, encoded body] of the last /api/sensors response;
+    # the dashboard polls this endpoint far more often than nodes report.
+    sensors_cache: list[Any] = [None, b""]
+    # node_id -> (snapshot, its encoded JSON object).  Snapshots are cached
+    # by the store until the node changes, so an identical object means
+    # the bytes can be reused and only changed nodes are re-encoded.
+    node_json: dict[int, tuple[Any, bytes]] = {}
+
     @app.route("/api/sensors")
     @login_required
     def api_sensors():
         store: SensorStore = app.config["STORE"]
-        nodes = store.get_all_nodes()
-        result = []
-        for n in nodes:
-            result.append({
-                "node_id": n.node_id,
-                "location": n.location,
-                "zone": n.zone,
-                "battery_percent": n.battery_percent,
-                "power_state": n.power_state,
-                "rssi": n.rssi,
-                "snr": n.snr,
-                "online": n.online,
-                "last_seen": n.last_seen,
-                "values": {
-                    str(k): v for k, v in n.values.items()
-                },
-            })
-        return jsonify(result)
+        version = store.version         # read before snapshotting
+        etag = f"{_BOOT_ID}-{version}"
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            cached_version, body = sensors_cache
+            if cached_version != version:
+                parts = []
+                for n in store.get_all_nodes():
+                    cached = node_json.get(n.node_id)
+                    if cached is None or cached[0] is not n:
+                        # Snapshot fields are exactly the API shape; integer
+                        # value-type keys are emitted as JSON strings.
+                        cached = node_json[n.node_id] = (n, _dumps(n._asdict()))
+                    parts.append(cached[1])
+                body = b"[" + b",".join(parts) + b"]"
+                sensors_cache[:] = (version, body)
+            resp = Response(body, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.cache_control.max_age = 1
+        return resp
 
     @app.route("/api/sensors/<int:node_id>/history")
     @login_required
@@ -153,8 +196,14 @@ def create_app(
         store: SensorStore = app.config["STORE"]
         limit = min(int(request.args.get("limit", 100)), 1000)
         since = float(request.args.get("since", 0.0))
-        rows = store.get_history(node_id, limit=limit, since=since)
-        return jsonify(rows)
+        # Sparklines ask for ?bucket=<seconds>&fields=battery_percent,rssi
+        bucket = max(float(request.args.get("bucket", 0)), 0.0)
+        fields = request.args.get("fields")
+        rows = store.get_history(
+            node_id, limit=limit, since=since, bucket_seconds=bucket,
+            fields=fields.split(",") if fields else None,
+        )
+        return _json(rows)
 
     # ------------------------------------------------------------------
     # API — commands
@@ -201,7 +250,7 @@ def create_app(
     @login_required
     def api_pending_commands():
         rc: RemoteConfig = app.config["RC"]
-        return jsonify(rc.all_pending())
+        return _json(rc.all_pending())
 
     # ------------------------------------------------------------------
     # API — configuration
@@ -218,7 +267,7 @@ def create_app(
                 for key in ("password", "smtp_password"):
                     if key in data[section] and data[section][key]:
                         data[section][key] = "***"
-        return jsonify(data)
+        return _json(data)
 
     @app.route("/api/config", methods=["POST"])
     @login_required
@@ -237,8 +286,11 @@ def create_app(
     def api_lora_status():
         lora = app.config.get("LORA")
         if lora is None:
-            return jsonify({"available": False, "mode": "stub"})
-        return jsonify(lora.radio_status)
+            status = {"available": False, "mode": "stub"}
+        else:
+            status = dict(lora.radio_status)
+        status["history_dropped"] = app.config["STORE"].history_dropped
+        return _json(status)
 
     @app.route("/api/lora/reboot-status", methods=["POST"])
     @login_required
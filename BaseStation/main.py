@@ -19,6 +19,11 @@ from lss_basestation.mqtt_manager import MQTTManager
 from lss_basestation.alerts import AlertManager
 from lss_basestation.web.app import create_app
 
+try:
+    from waitress import serve  # type: ignore
+except ImportError:
+    serve = None
+
 
 def _configure_logging() -> None:
     """Set up root logger to write to stdout and to a rotating file."""
@@ -71,6 +76,7 @@ def main() -> None:
         password=mqtt_cfg.get("password", ""),
         topic_prefix=mqtt_cfg.get("topic_prefix", "lss"),
         enabled=bool(mqtt_cfg.get("enabled", False)),
+        per_value_topics=bool(mqtt_cfg.get("per_value_topics", True)),
     )
 
     alert_cfg = config_storage.get_section("alerts")
@@ -83,6 +89,7 @@ def main() -> None:
         smtp_from=alert_cfg.get("smtp_from", ""),
         smtp_to=alert_cfg.get("smtp_to", []),
         rate_limit_seconds=int(alert_cfg.get("rate_limit_seconds", 300)),
+        burst=int(alert_cfg.get("rate_limit_burst", 1)),
     )
 
     # ------------------------------------------------------------------
@@ -110,12 +117,27 @@ def main() -> None:
     )
 
     logger.info("Starting web server on %s:%d", cfg.FLASK_HOST, cfg.FLASK_PORT)
-    flask_app.run(
-        host=cfg.FLASK_HOST,
-        port=cfg.FLASK_PORT,
-        debug=cfg.FLASK_DEBUG,
-        use_reloader=False,     # Reloader conflicts with background threads
-    )
+    try:
+        if serve is not None and not cfg.FLASK_DEBUG:
+            serve(flask_app, host=cfg.FLASK_HOST, port=cfg.FLASK_PORT,
+                  threads=cfg.WEB_THREADS)
+        else:
+            if serve is None:
+                logger.warning("waitress not installed; using the Flask "
+                               "development server")
+            flask_app.run(
+                host=cfg.FLASK_HOST,
+                port=cfg.FLASK_PORT,
+                debug=cfg.FLASK_DEBUG,
+                use_reloader=False,     # Reloader conflicts with background threads
+            )
+    finally:
+        logger.info("Shutting down")
+        lora_manager.stop()
+        mqtt_manager.disconnect()
+        alert_manager.close()
+        sensor_store.close()
+        config_storage.close()
 
 
 if __name__ == "__main__":
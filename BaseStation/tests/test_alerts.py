@@ -4,13 +4,18 @@ tests/test_alerts.py — Unit tests for alerts.py.
 Tests cover:
   - Rate limiting suppresses repeated alerts within the window
   - Rate limit expires after the configured period
-  - Teams dispatch calls the correct URL (mocked requests)
+  - Token bucket allows a configured burst, then paces at the refill rate
+  - Queued alerts are drained by the worker pool; a full queue drops
+  - Alerts arriving within the batch window share one card / email
+  - Teams dispatch calls the correct URL (mocked requests session)
   - Email dispatch calls SMTP (mocked smtplib)
+  - SMTP session is reused across sends and rebuilt when NOOP fails
+  - test_email uses a one-off session that is not pooled
   - test_teams returns success/failure pair
   - test_email returns failure when no recipients configured
 """
 
-import time
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -35,52 +40,140 @@ def alert_mgr():
 # Rate limiting
 # ============================================================
 
+def _posted_texts(mock_sess):
+    """Return the MessageCard text of every Teams POST made on *mock_sess*."""
+    return [json.loads(c.kwargs["data"])["text"]
+            for c in mock_sess.post.call_args_list]
+
+
 def test_rate_limit_suppresses(alert_mgr):
-    calls = []
-    with patch("lss_basestation.alerts._requests") as mock_req:
-        mock_req.post.return_value = MagicMock(status_code=200)
-        alert_mgr.send("Test", "body", key="test_key")
-        # Give async thread a moment
-        time.sleep(0.1)
-        first_count = mock_req.post.call_count
+    with patch("lss_basestation.alerts._session") as mock_sess, \
+         patch("smtplib.SMTP"):
+        mock_sess.post.return_value = MagicMock(status_code=200)
+        alert_mgr.send("First", "body", key="test_key")
         # Second call with same key — should be suppressed
-        alert_mgr.send("Test", "body", key="test_key")
-        time.sleep(0.1)
-        assert mock_req.post.call_count == first_count  # no new call
+        alert_mgr.send("Second", "body", key="test_key")
+        alert_mgr.close()
+        texts = " ".join(_posted_texts(mock_sess))
+        assert "First" in texts
+        assert "Second" not in texts
 
 
 def test_rate_limit_different_keys(alert_mgr):
-    with patch("lss_basestation.alerts._requests") as mock_req:
-        mock_req.post.return_value = MagicMock(status_code=200)
-        alert_mgr.send("A", "body", key="key_a")
-        alert_mgr.send("B", "body", key="key_b")
-        time.sleep(0.2)
-        assert mock_req.post.call_count >= 2
+    with patch("lss_basestation.alerts._session") as mock_sess, \
+         patch("smtplib.SMTP"):
+        mock_sess.post.return_value = MagicMock(status_code=200)
+        alert_mgr.send("Alpha", "body", key="key_a")
+        alert_mgr.send("Beta", "body", key="key_b")
+        alert_mgr.close()
+        texts = " ".join(_posted_texts(mock_sess))
+        assert "Alpha" in texts and "Beta" in texts
 
 
 def test_no_rate_limit_when_key_empty(alert_mgr):
-    with patch("lss_basestation.alerts._requests") as mock_req:
-        mock_req.post.return_value = MagicMock(status_code=200)
+    with patch("lss_basestation.alerts._session") as mock_sess, \
+         patch("smtplib.SMTP"):
+        mock_sess.post.return_value = MagicMock(status_code=200)
         # Empty key bypasses rate limiting
         alert_mgr.send("X", "body", key="")
         alert_mgr.send("X", "body", key="")
-        time.sleep(0.2)
-        assert mock_req.post.call_count >= 2
+        alert_mgr.close()
+        assert " ".join(_posted_texts(mock_sess)).count("**X**") == 2
 
 
-def test_rate_limit_expires(alert_mgr):
+def test_rate_limit_expires():
     """After window expires, the same key can fire again."""
     mgr = AlertManager(
         teams_webhook_url="https://example.com/webhook",
         rate_limit_seconds=0,
     )
-    with patch("lss_basestation.alerts._requests") as mock_req:
-        mock_req.post.return_value = MagicMock(status_code=200)
+    with patch("lss_basestation.alerts._session") as mock_sess:
+        mock_sess.post.return_value = MagicMock(status_code=200)
         mgr.send("A", "body", key="k")
-        time.sleep(0.1)
         mgr.send("A", "body", key="k")
-        time.sleep(0.1)
-        assert mock_req.post.call_count >= 2
+        mgr.close()
+        assert " ".join(_posted_texts(mock_sess)).count("**A**") == 2
+
+
+def test_rate_limit_uses_monotonic_clock():
+    mgr = AlertManager(rate_limit_seconds=60)
+    with patch("lss_basestation.alerts.time.monotonic", side_effect=[5.0, 30.0, 70.0]):
+        assert mgr._check_and_record("k") is False   # first send, even near t=0
+        assert mgr._check_and_record("k") is True    # 25 s later
+        assert mgr._check_and_record("k") is False   # 65 s later
+
+
+def test_rate_limit_burst():
+    mgr = AlertManager(rate_limit_seconds=60, burst=3)
+    with patch("lss_basestation.alerts.time.monotonic",
+               side_effect=[0.0, 0.0, 0.0, 0.0, 30.0, 60.0]):
+        assert [mgr._check_and_record("k") for _ in range(4)] == \
+            [False, False, False, True]
+        assert mgr._check_and_record("k") is True    # half a token refilled
+        assert mgr._check_and_record("k") is False   # one full token refilled
+
+
+def test_rate_limit_keys_bounded():
+    mgr = AlertManager(rate_limit_seconds=60)
+    with patch("lss_basestation.alerts._MAX_RATE_KEYS", 3):
+        for i in range(5):
+            mgr._check_and_record(f"k{i}")
+    assert list(mgr._buckets) == ["k2", "k3", "k4"]
+
+
+def test_rate_limit_stale_keys_pruned():
+    mgr = AlertManager(rate_limit_seconds=10)
+    with patch("lss_basestation.alerts.time.monotonic", side_effect=[0.0, 100.0]):
+        mgr._check_and_record("old")
+        mgr._check_and_record("new")
+    assert list(mgr._buckets) == ["new"]
+
+
+# ============================================================
+# Worker pool
+# ============================================================
+
+def test_close_drains_queue():
+    mgr = AlertManager(teams_webhook_url="https://example.com/webhook")
+    with patch("lss_basestation.alerts._session") as mock_sess:
+        mock_sess.post.return_value = MagicMock(status_code=200)
+        for i in range(5):
+            mgr.send(f"Alert{i}", "body", key=f"k{i}")
+        mgr.close()
+        texts = " ".join(_posted_texts(mock_sess))
+        assert all(f"Alert{i}" in texts for i in range(5))
+
+
+def test_burst_batched_into_one_card():
+    with patch("lss_basestation.alerts._session") as mock_sess, \
+         patch("lss_basestation.alerts._WORKER_COUNT", 1):
+        mock_sess.post.return_value = MagicMock(status_code=200)
+        mgr = AlertManager(teams_webhook_url="https://example.com/webhook")
+        for i in range(4):
+            mgr.send(f"Node {i}: Low Battery", "Battery at 5%")
+        mgr.close()
+        texts = _posted_texts(mock_sess)
+        assert len(texts) == 1
+        assert "4 alerts" in texts[0]
+        assert "- **Node 3: Low Battery** — Battery at 5%" in texts[0]
+
+
+def test_batch_sends_one_email(alert_mgr):
+    with patch("smtplib.SMTP") as mock_smtp, \
+         patch("lss_basestation.alerts._session"):
+        alert_mgr._dispatch_batch([("S1", "b1"), ("S2", "b2")])
+        _, _, data = mock_smtp.return_value.sendmail.call_args.args
+        assert mock_smtp.return_value.sendmail.call_count == 1
+        assert b"Subject: LSS: 2 alerts" in data
+
+
+def test_queue_full_drops():
+    with patch("lss_basestation.alerts._QUEUE_MAXSIZE", 1):
+        mgr = AlertManager(rate_limit_seconds=0)
+    mgr.close()  # stop workers so nothing drains the queue
+    mgr.send("A", "body")
+    mgr.send("B", "body")  # must not raise or block
+    assert mgr._queue.qsize() == 1
 
 
 # ============================================================
@@ -88,15 +181,25 @@ def test_rate_limit_expires(alert_mgr):
 # ============================================================
 
 def test_teams_success(alert_mgr):
-    with patch("lss_basestation.alerts._requests") as mock_req:
+    with patch("lss_basestation.alerts._session") as mock_req:
         mock_req.post.return_value = MagicMock(status_code=200)
         ok, msg = alert_mgr.test_teams("hello")
         assert ok is True
         assert msg == "OK"
 
 
+def test_teams_payload_is_message_card(alert_mgr):
+    with patch("lss_basestation.alerts._session") as mock_sess:
+        mock_sess.post.return_value = MagicMock(status_code=200)
+        alert_mgr.test_teams('say "hi" — °C')
+        _, kwargs = mock_sess.post.call_args
+        card = json.loads(kwargs["data"])
+        assert card["@type"] == "MessageCard"
+        assert card["text"] == '**LSS Test** — say "hi" — °C'
+
+
 def test_teams_http_error(alert_mgr):
-    with patch("lss_basestation.alerts._requests") as mock_req:
+    with patch("lss_basestation.alerts._session") as mock_req:
         mock_req.post.return_value = MagicMock(status_code=500, text="err")
         ok, msg = alert_mgr.test_teams()
         assert ok is False
@@ -104,7 +207,7 @@ def test_teams_http_error(alert_mgr):
 
 
 def test_teams_request_exception(alert_mgr):
-    with patch("lss_basestation.alerts._requests") as mock_req:
+    with patch("lss_basestation.alerts._session") as mock_req:
         mock_req.post.side_effect = Exception("timeout")
         ok, msg = alert_mgr.test_teams()
         assert ok is False
@@ -130,6 +233,58 @@ def test_email_success(alert_mgr):
         assert ok is True
 
 
+def test_email_message_bytes(alert_mgr):
+    with patch("smtplib.SMTP") as mock_smtp:
+        alert_mgr.test_email()
+        alert_mgr.test_email()
+        calls = mock_smtp.return_value.sendmail.call_args_list
+        sender, to, data = calls[0].args
+        assert sender == "lss@example.com"
+        assert to == ["admin@example.com"]
+        assert b"Subject: LSS Test Alert\r\n" in data
+        assert calls[1].args[2] is data  # cached bytes reused
+
+
+def _worker_email(mgr):
+    """Send the way the dispatch workers do (pooled session)."""
+    return mgr._send_email("S", "b", ["admin@example.com"])
+
+
+def test_email_reuses_connection(alert_mgr):
+    with patch("smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.noop.return_value = (250, b"OK")
+        assert _worker_email(alert_mgr)[0] is True
+        assert _worker_email(alert_mgr)[0] is True
+        assert mock_smtp.call_count == 1
+        assert mock_smtp.return_value.sendmail.call_count == 2
+        assert mock_smtp.return_value.login.call_count == 1
+
+
+def test_email_reconnects_when_stale(alert_mgr):
+    with patch("smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.noop.side_effect = Exception("gone away")
+        _worker_email(alert_mgr)
+        ok, _ = _worker_email(alert_mgr)
+        assert ok is True
+        assert mock_smtp.call_count == 2
+
+
+def test_close_pool_quits_connections(alert_mgr):
+    with patch("smtplib.SMTP") as mock_smtp:
+        _worker_email(alert_mgr)
+        alert_mgr.close_pool()
+        mock_smtp.return_value.quit.assert_called_once()
+
+
+def test_test_email_does_not_pool(alert_mgr):
+    with patch("smtplib.SMTP") as mock_smtp:
+        assert alert_mgr.test_email()[0] is True
+        mock_smtp.return_value.quit.assert_called_once()
+        assert alert_mgr._smtp_conns == []
+        alert_mgr.test_email()
+        assert mock_smtp.call_count == 2
+
+
 def test_email_no_recipients():
     mgr = AlertManager(smtp_host="smtp.example.com")
     ok, msg = mgr.test_email()
@@ -0,0 +1,193 @@
+"""
+tests/test_config_storage.py — Unit tests for config_storage.py.
+
+Tests cover:
+  - Defaults are written on first run and are never shared between instances
+  - Node metadata is persisted in nodes.json, separately from config.json
+    (written first when migrating nodes out of config.json)
+  - Mutations are visible immediately and persisted by flush()
+  - A burst of mutations is coalesced into a single file write
+  - Writes are atomic (temp file + rename, no stray temp file)
+  - close() persists pending changes without waiting out the debounce
+  - all() returns an independent deep copy
+  - Unchanged content is not rewritten
+  - Sections are locked independently
+  - get_node returns a read-only view, kept in sync with every writer
+  - Node listeners fire after every node metadata change
+"""
+
+import json
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from lss_basestation.config_storage import ConfigStorage
+
+
+@pytest.fixture
+def cfg_path(tmp_path):
+    return str(tmp_path / "config.json")
+
+
+@pytest.fixture
+def cs(cfg_path):
+    storage = ConfigStorage(path=cfg_path)
+    yield storage
+    storage.close()
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+# ============================================================
+
+def _nodes_path(cfg_path):
+    return os.path.join(os.path.dirname(cfg_path), "nodes.json")
+
+
+def test_defaults_written_on_first_run(cs, cfg_path):
+    data = _read(cfg_path)
+    assert "lora" in data
+    assert "nodes" not in data
+    assert _read(_nodes_path(cfg_path)) == {}
+
+
+def test_defaults_not_shared(tmp_path):
+    a = ConfigStorage(path=str(tmp_path / "a" / "config.json"))
+    b = ConfigStorage(path=str(tmp_path / "b" / "config.json"))
+    a.update_section("alerts", {"smtp_port": 25})
+    a.get("alerts")["smtp_to"].append("x@example.com")
+    assert b.get_section("alerts")["smtp_port"] == 587
+    assert b.get_section("alerts")["smtp_to"] == []
+    a.close()
+    b.close()
+
+
+def test_set_visible_before_flush(cs):
+    cs.set("web_password", "pw")
+    assert cs.get("web_password") == "pw"
+
+
+def test_flush_persists(cs, cfg_path):
+    cs.set_node(3, {"location": "Attic"})
+    cs.flush()
+    assert _read(_nodes_path(cfg_path))["3"] == {"location": "Attic"}
+    assert not os.path.exists(_nodes_path(cfg_path) + ".tmp")
+
+
+def test_burst_coalesced(cs, cfg_path):
+    with patch.object(cs, "_write_atomic", wraps=cs._write_atomic) as spy:
+        for i in range(20):
+            cs.set_node(i, {"n": i})
+        cs.flush()
+        cs.flush()  # nothing pending — must not write again
+        assert spy.call_count == 1
+    assert len(_read(_nodes_path(cfg_path))) == 20
+
+
+def test_close_persists_pending(cfg_path):
+    cs = ConfigStorage(path=cfg_path)
+    cs.update_section("mqtt", {"broker": "mqtt.local"})
+    start = time.monotonic()
+    cs.close()
+    assert time.monotonic() - start < 0.1     # does not wait out the debounce
+    assert _read(cfg_path)["mqtt"]["broker"] == "mqtt.local"
+
+
+def test_reload_round_trip(cfg_path):
+    cs = ConfigStorage(path=cfg_path)
+    cs.set("network_id", 7)
+    cs.close()
+    assert ConfigStorage(path=cfg_path).get("network_id") == 7
+
+
+def test_all_is_deep_copy(cs):
+    snap = cs.all()
+    snap["mqtt"]["password"] = "***"
+    snap["alerts"]["smtp_to"].append("x@example.com")
+    assert cs.get_section("mqtt")["password"] == ""
+    assert cs.get_section("alerts")["smtp_to"] == []
+
+
+def test_corrupt_file_falls_back_to_defaults(cfg_path):
+    with open(cfg_path, "w", encoding="utf-8") as fh:
+        fh.write("{not json")
+    cs = ConfigStorage(path=cfg_path)
+    assert cs.get("lora") is not None
+    cs.close()
+
+
+def test_unchanged_content_not_rewritten(cs):
+    cs.set_node(1, {"location": "Shed"})
+    cs.flush()
+    with patch.object(cs, "_write_atomic") as spy:
+        cs.set_node(1, {"location": "Shed"})
+        cs.flush()
+        spy.assert_not_called()
+
+
+def test_set_node_writes_only_nodes_file(cs, cfg_path):
+    with patch.object(cs, "_write_atomic", wraps=cs._write_atomic) as spy:
+        cs.set_node(4, {"zone": "B"})
+        cs.flush()
+    assert [c.args[0] for c in spy.call_args_list] == [_nodes_path(cfg_path)]
+
+
+def test_legacy_embedded_nodes_migrated(cfg_path):
+    with open(cfg_path, "w", encoding="utf-8") as fh:
+        json.dump({"network_id": 2, "nodes": {"5": {"zone": "C"}}}, fh)
+    cs = ConfigStorage(path=cfg_path)
+    assert cs.get_node(5) == {"zone": "C"}
+    cs.close()
+    assert "nodes" not in _read(cfg_path)
+    assert _read(_nodes_path(cfg_path)) == {"5": {"zone": "C"}}
+
+
+def test_legacy_migration_writes_nodes_file_first(cfg_path):
+    with open(cfg_path, "w", encoding="utf-8") as fh:
+        json.dump({"network_id": 2, "nodes": {"5": {"zone": "C"}}}, fh)
+    with patch.object(ConfigStorage, "_write_atomic", autospec=True,
+                      side_effect=ConfigStorage._write_atomic) as spy:
+        ConfigStorage(path=cfg_path).close()
+    paths = [c.args[1] for c in spy.call_args_list]
+    assert paths == [_nodes_path(cfg_path), cfg_path]
+
+
+def test_sections_locked_independently(cs):
+    with cs._locks["nodes"]:
+        # Would deadlock with a single global lock.
+        assert cs.get_section("alerts")["smtp_port"] == 587
+        cs.update_section("mqtt", {"port": 8883})
+    assert cs.get_section("mqtt")["port"] == 8883
+
+
+def test_get_node_read_only_view(cs):
+    cs.set_node(6, {"temp_thresh_high": 40.0})
+    node = cs.get_node(6)
+    assert node["temp_thresh_high"] == 40.0
+    with pytest.raises(TypeError):
+        node["temp_thresh_high"] = 1.0
+    assert cs.get_node(99) == {}
+
+
+def test_get_node_after_replace_all(cs):
+    cs.replace_all({"network_id": 1, "nodes": {"8": {"zone": "D"}, "bad": {}}})
+    assert cs.get_node(8) == {"zone": "D"}
+    cs.set("nodes", {"9": {"zone": "E"}})
+    assert cs.get_node(8) == {}
+    assert cs.get_node(9) == {"zone": "E"}
+
+
+def test_node_listeners_notified(cs):
+    calls = []
+    cs.add_node_listener(lambda: calls.append(1))
+    cs.set_node(1, {"name": "a"})
+    cs.update_section("nodes", {"2": {"name": "b"}})
+    cs.set("nodes", {})
+    cs.replace_all(cs.all())
+    cs.update_section("mqtt", {"enabled": True})
+    assert len(calls) == 4
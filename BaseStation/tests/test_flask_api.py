@@ -4,19 +4,21 @@ tests/test_flask_api.py — Integration tests for the Flask REST API.
 Tests cover:
   - Unauthenticated requests return 401
   - Login flow (GET and POST)
-  - GET /api/sensors returns node list
-  - GET /api/sensors/<id>/history returns time-series
+  - Dashboard HTML is re-rendered only when node state changes
+  - GET /api/sensors returns node list (string value-type keys)
+  - GET /api/sensors: ETag / 304 until node state changes or the process
+    restarts; only changed nodes are re-encoded
+  - GET /api/sensors/<id>/history returns time-series (raw or bucketed)
   - POST /api/command queues a command
   - GET /api/config returns config (credentials redacted)
   - POST /api/config saves new config
-  - GET /api/lora/status when no hardware
+  - GET /api/lora/status when no hardware (with history drop gauge)
   - POST /api/mqtt/test (mocked)
   - POST /api/alerts/test (mocked)
   - POST /api/alerts/test-email (mocked)
   - 404 on unknown JSON endpoint
 """
 
-import json
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -35,7 +37,7 @@ def app(tmp_path):
     db_path = str(tmp_path / "test.db")
     cfg_path = str(tmp_path / "config.json")
 
-    store  = SensorStore(db_path=db_path)
+    store  = SensorStore(db_path=db_path, start_watchdog=False)
     rc     = RemoteConfig()
     cs     = ConfigStorage(path=cfg_path)
     cs.set("web_password", "testpass")
@@ -55,7 +57,9 @@ def app(tmp_path):
     )
     flask_app.config["TESTING"] = True
     flask_app.config["SECRET_KEY"] = "test-secret"
-    return flask_app
+    yield flask_app
+    store.close()
+    cs.close()
 
 
 @pytest.fixture
@@ -74,6 +78,27 @@ def auth_client(client):
 # Auth
 # ============================================================
 
+def test_dashboard_rendered_once_per_change(auth_client, app):
+    store: SensorStore = app.config["STORE"]
+    with patch.object(store, "get_all_nodes", wraps=store.get_all_nodes) as spy:
+        first = auth_client.get("/")
+        second = auth_client.get("/")
+        assert first.status_code == 200
+        assert first.data == second.data
+        assert spy.call_count == 1
+        store._mark_offline(0)            # no change: still cached
+        auth_client.get("/")
+        assert spy.call_count == 1
+        store.ingest_multi_sensor(MultiSensorPacket(
+            sync_word=cfg.SYNC_MULTI_SENSOR, network_id=1,
+            packet_type=cfg.PACKET_MULTI_SENSOR, sensor_id=6,
+            battery_percent=50, power_state=0, last_command_seq=0,
+            ack_status=0, location="Attic", zone="", values=[],
+        ))
+        assert b"Attic" in auth_client.get("/").data
+        assert spy.call_count == 2
+
+
 def test_dashboard_requires_auth(client):
     resp = client.get("/")
     assert resp.status_code == 302  # redirect to /login
@@ -114,7 +139,7 @@ def test_logout(auth_client):
 def test_api_sensors_empty(auth_client):
     resp = auth_client.get("/api/sensors")
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data == []
 
 
@@ -137,10 +162,83 @@ def test_api_sensors_with_node(auth_client, app):
     )
     store.ingest_multi_sensor(pkt)
     resp = auth_client.get("/api/sensors")
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert len(data) == 1
     assert data[0]["node_id"] == 2
     assert data[0]["location"] == "Hall"
+    assert resp.mimetype == "application/json"
+    assert data[0]["values"] == {str(cfg.VALUE_TEMPERATURE): 21.5}
+    assert set(data[0]) == {
+        "node_id", "location", "zone", "battery_percent", "power_state",
+        "rssi", "snr", "online", "last_seen", "values",
+    }
+
+def test_api_sensors_etag(auth_client, app):
+    store: SensorStore = app.config["STORE"]
+    first = auth_client.get("/api/sensors")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "max-age=1"
+    resp = auth_client.get("/api/sensors", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    store.ingest_multi_sensor(MultiSensorPacket(
+        sync_word=cfg.SYNC_MULTI_SENSOR, network_id=1,
+        packet_type=cfg.PACKET_MULTI_SENSOR, sensor_id=4,
+        battery_percent=50, power_state=0, last_command_seq=0, ack_status=0,
+        location="", zone="", values=[],
+    ))
+    resp = auth_client.get("/api/sensors", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert [n["node_id"] for n in resp.get_json()] == [4]
+
+
+def test_api_sensors_etag_not_reused_after_restart(auth_client, app,
+                                                    tmp_path, monkeypatch):
+    from lss_basestation.web import app as web_app
+    etag = auth_client.get("/api/sensors").headers["ETag"]
+    # Simulate a restart: new process nonce, new store at version 0.
+    monkeypatch.setattr(web_app, "_BOOT_ID", "restarted")
+    store = SensorStore(db_path=str(tmp_path / "restart.db"),
+                        start_watchdog=False)
+    new_app = create_app(
+        sensor_store=store,
+        remote_config=app.config["RC"],
+        config_storage=app.config["CFG"],
+        mqtt_manager=app.config["MQTT"],
+        alert_manager=app.config["ALERTS"],
+    )
+    new_app.config["TESTING"] = True
+    new_app.config["SECRET_KEY"] = "test-secret"
+    client = new_app.test_client()
+    client.post("/login", data={"password": "testpass"})
+    resp = client.get("/api/sensors", headers={"If-None-Match": etag})
+    store.close()
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_api_sensors_reencodes_changed_nodes_only(auth_client, app):
+    from lss_basestation.web import app as web_app
+    store: SensorStore = app.config["STORE"]
+
+    def ingest(nid):
+        store.ingest_multi_sensor(MultiSensorPacket(
+            sync_word=cfg.SYNC_MULTI_SENSOR, network_id=1,
+            packet_type=cfg.PACKET_MULTI_SENSOR, sensor_id=nid,
+            battery_percent=50, power_state=0, last_command_seq=0,
+            ack_status=0, location="", zone="",
+            values=[SensorValue(cfg.VALUE_TEMPERATURE, 20.0 + nid)],
+        ))
+
+    ingest(1)
+    ingest(2)
+    auth_client.get("/api/sensors")
+    ingest(2)
+    with patch.object(web_app, "_dumps", wraps=web_app._dumps) as spy:
+        data = auth_client.get("/api/sensors").get_json()
+    assert spy.call_count == 1
+    assert sorted(n["node_id"] for n in data) == [1, 2]
+    assert data[0]["values"][str(cfg.VALUE_TEMPERATURE)] in (21.0, 22.0)
 
 # ============================================================
 # GET /api/sensors/<id>/history
@@ -149,7 +247,7 @@ def test_api_sensors_with_node(auth_client, app):
 def test_history_empty(auth_client):
     resp = auth_client.get("/api/sensors/99/history")
     assert resp.status_code == 200
-    assert json.loads(resp.data) == []
+    assert resp.get_json() == []
 
 
 def test_history_with_data(auth_client, app):
@@ -169,8 +267,12 @@ def test_history_with_data(auth_client, app):
     )
     store.ingest_multi_sensor(pkt)
     resp = auth_client.get("/api/sensors/3/history?limit=10")
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert len(data) == 1
+    resp = auth_client.get("/api/sensors/3/history?bucket=60&fields=battery_percent")
+    data = resp.get_json()
+    assert set(data[0]) == {"timestamp", "battery_percent"}
+    assert data[0]["battery_percent"] == 60
 
 # ============================================================
 # POST /api/command
@@ -178,35 +280,27 @@ def test_history_with_data(auth_client, app):
 
 def test_queue_command(auth_client):
     payload = {"node_id": 5, "command_type": cfg.CMD_PING}
-    resp = auth_client.post("/api/command",
-                            data=json.dumps(payload),
-                            content_type="application/json")
+    resp = auth_client.post("/api/command", json=payload)
     assert resp.status_code == 202
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["queued"] is True
     assert "sequence_number" in data
 
 
 def test_queue_command_missing_fields(auth_client):
-    resp = auth_client.post("/api/command",
-                            data=json.dumps({"node_id": 1}),
-                            content_type="application/json")
+    resp = auth_client.post("/api/command", json={"node_id": 1})
     assert resp.status_code == 400
 
 
 def test_queue_command_invalid_node(auth_client):
     payload = {"node_id": 0, "command_type": cfg.CMD_PING}
-    resp = auth_client.post("/api/command",
-                            data=json.dumps(payload),
-                            content_type="application/json")
+    resp = auth_client.post("/api/command", json=payload)
     assert resp.status_code == 400
 
 
 def test_queue_command_bad_data_hex(auth_client):
     payload = {"node_id": 1, "command_type": cfg.CMD_PING, "data": "ZZZZ"}
-    resp = auth_client.post("/api/command",
-                            data=json.dumps(payload),
-                            content_type="application/json")
+    resp = auth_client.post("/api/command", json=payload)
     assert resp.status_code == 400
 
 
@@ -226,7 +320,7 @@ def test_restart_convenience(auth_client):
 def test_get_config(auth_client):
     resp = auth_client.get("/api/config")
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert "lora" in data
     assert "mqtt" in data
 
@@ -235,17 +329,15 @@ def test_get_config_redacts_password(auth_client, app):
     cs: ConfigStorage = app.config["CFG"]
     cs.update_section("mqtt", {"password": "supersecret", "enabled": True})
     resp = auth_client.get("/api/config")
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["mqtt"]["password"] == "***"
 
 
 def test_post_config(auth_client):
     new_cfg = {"network_id": 2, "lora": {"frequency": 915.0}}
-    resp = auth_client.post("/api/config",
-                            data=json.dumps(new_cfg),
-                            content_type="application/json")
+    resp = auth_client.post("/api/config", json=new_cfg)
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["saved"] is True
 
 # ============================================================
@@ -255,8 +347,9 @@ def test_post_config(auth_client):
 def test_lora_status_no_hardware(auth_client):
     resp = auth_client.get("/api/lora/status")
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["available"] is False
+    assert data["history_dropped"] == 0
 
 # ============================================================
 # POST /api/mqtt/test
@@ -265,7 +358,7 @@ def test_lora_status_no_hardware(auth_client):
 def test_mqtt_test(auth_client):
     resp = auth_client.post("/api/mqtt/test")
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["success"] is True
 
 # ============================================================
@@ -275,16 +368,14 @@ def test_mqtt_test(auth_client):
 def test_alerts_test(auth_client):
     resp = auth_client.post("/api/alerts/test")
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["success"] is True
 
 
 def test_alerts_test_email(auth_client):
-    resp = auth_client.post("/api/alerts/test-email",
-                            data=json.dumps({}),
-                            content_type="application/json")
+    resp = auth_client.post("/api/alerts/test-email", json={})
     assert resp.status_code == 200
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert data["success"] is True
 
 # ============================================================
@@ -294,5 +385,5 @@ def test_alerts_test_email(auth_client):
 def test_404_json(auth_client):
     resp = auth_client.get("/api/nonexistent")
     assert resp.status_code == 404
-    data = json.loads(resp.data)
+    data = resp.get_json()
     assert "error" in data
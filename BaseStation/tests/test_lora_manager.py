@@ -0,0 +1,360 @@
+"""
+tests/test_lora_manager.py — Unit tests for lora_manager.py.
+
+Runs without radio hardware: a FakeRadio stands in for adafruit_rfm9x.RFM9x.
+
+Tests cover:
+  - Burst FIFO receive: single read of the whole packet into the reused buffer
+  - Burst FIFO receive: timeout, CRC error and empty FIFO return None
+  - DIO0 interrupt RX: wakes on the event, ignores stale edges
+  - Wake-ups: polling RX ends early when TX work is enqueued
+  - RX logging: hex dump only built when INFO is enabled
+  - Legacy packets: stored and republished to MQTT as multi-sensor
+  - Time sync: monotonic deadline, one broadcast frame
+  - start(): loop body chosen once by radio presence
+  - Radio loop: due commands sent before listening; wait bounded by the
+    next retry; command-queue purge at most once per second
+  - Alert thresholds: temperature high/low, battery critical/low, defaults
+  - Alert thresholds: cached per node until node config changes
+"""
+
+import struct
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from lss_basestation import config as cfg
+from lss_basestation import lora_manager as lm
+from lss_basestation.lora_manager import LoRaManager
+from lss_basestation.packet_parser import MultiSensorPacket, SensorValue
+
+
+class FakeRadio:
+    """Minimal SX127x register model for the paths LoRaManager touches."""
+
+    def __init__(self, packet: bytes = b"", ready: bool = True,
+                 crc_error: bool = False) -> None:
+        self.packet = packet
+        self.ready = ready
+        self.crc = crc_error
+        self.enable_crc = True
+        self.crc_error_count = 0
+        self.rssi = -42
+        self.snr = 7.5
+        self.last_rssi = None
+        self.last_snr = None
+        self.regs = {lm._REG_RX_NB_BYTES: len(packet),
+                     lm._REG_FIFO_RX_CURRENT_ADDR: 0x20}
+        self.writes: list[tuple[int, int]] = []
+        self.reads_into: list[tuple[int, int]] = []
+        self.sent: list[tuple[bytes, int]] = []
+
+    def listen(self) -> None:
+        pass
+
+    def idle(self) -> None:
+        pass
+
+    def rx_done(self) -> bool:
+        return self.ready
+
+    def crc_error(self) -> bool:
+        return self.crc
+
+    def _read_u8(self, address: int) -> int:
+        return self.regs.get(address, 0)
+
+    def _write_u8(self, address: int, value: int) -> None:
+        self.writes.append((address, value))
+
+    def send(self, data, destination=None, node=None) -> None:
+        self.sent.append((bytes(data), destination))
+
+    def _read_into(self, address: int, buf, length=None) -> None:
+        self.reads_into.append((address, length))
+        buf[:length] = self.packet[:length]
+
+
+def _manager(radio=None) -> LoRaManager:
+    mgr = LoRaManager(MagicMock(), MagicMock(), MagicMock())
+    mgr._radio = radio
+    return mgr
+
+
+# ============================================================
+# Burst FIFO receive
+# ============================================================
+
+def test_receive_burst_reads_fifo_once():
+    radio = FakeRadio(b"\xcd\xab\x01\x02\x03\x04")
+    mgr = _manager(radio)
+    view = mgr._receive_burst(timeout=0.1)
+    assert bytes(view) == b"\xcd\xab\x01\x02\x03\x04"
+    assert radio.reads_into == [(lm._REG_FIFO, 6)]
+    assert (lm._REG_FIFO_ADDR_PTR, 0x20) in radio.writes
+    assert (lm._REG_IRQ_FLAGS, 0xFF) in radio.writes
+    assert radio.last_rssi == -42 and radio.last_snr == 7.5
+
+
+def test_receive_burst_reuses_buffer():
+    radio = FakeRadio(b"\x01\x02\x03")
+    mgr = _manager(radio)
+    first = mgr._receive_burst(timeout=0.1)
+    assert first.obj is mgr._rx_buf
+    second = mgr._receive_burst(timeout=0.1)
+    assert second.obj is mgr._rx_buf
+
+
+def test_receive_burst_timeout():
+    radio = FakeRadio(b"\x01", ready=False)
+    assert _manager(radio)._receive_burst(timeout=0.01) is None
+    assert radio.reads_into == []
+
+
+def test_receive_burst_crc_error():
+    radio = FakeRadio(b"\x01\x02", crc_error=True)
+    assert _manager(radio)._receive_burst(timeout=0.1) is None
+    assert radio.crc_error_count == 1
+    assert radio.reads_into == []
+    assert (lm._REG_IRQ_FLAGS, 0xFF) in radio.writes
+
+
+def test_receive_burst_empty_fifo():
+    radio = FakeRadio(b"")
+    assert _manager(radio)._receive_burst(timeout=0.1) is None
+
+
+# ============================================================
+# DIO0 interrupt-driven receive / wake-ups
+# ============================================================
+
+def test_receive_burst_waits_on_dio0_event():
+    radio = FakeRadio(b"\x01\x02")
+    mgr = _manager(radio)
+    mgr._irq_enabled = True
+    threading.Timer(0.02, mgr._wake.set).start()
+    assert bytes(mgr._receive_burst(timeout=2.0)) == b"\x01\x02"
+    assert not mgr._wake.is_set()
+
+
+def test_receive_burst_stale_dio0_edge():
+    radio = FakeRadio(b"\x01", ready=False)
+    mgr = _manager(radio)
+    mgr._irq_enabled = True
+    mgr._wake.set()
+    assert mgr._receive_burst(timeout=2.0) is None
+    assert radio.reads_into == []
+
+
+def test_receive_burst_polling_ends_on_wake():
+    radio = FakeRadio(b"\x01", ready=False)
+    mgr = _manager(radio)
+    threading.Timer(0.02, mgr._wake.set).start()
+    start = time.monotonic()
+    assert mgr._receive_burst(timeout=2.0) is None
+    assert time.monotonic() - start < 1.0
+    assert not mgr._wake.is_set()
+
+
+def test_enqueue_wakes_radio_thread():
+    mgr = _manager()
+    mgr._rc.set_enqueue_callback.assert_called_once_with(mgr._wake.set)
+
+
+# ============================================================
+# Radio loop (single thread for RX and TX)
+# ============================================================
+
+def test_start_binds_loop_by_radio_presence():
+    stub = _manager()
+    with patch.object(lm, "_HARDWARE_AVAILABLE", False):
+        stub.start()
+    assert stub._thread._target == stub._radio_loop_stub
+    stub.stop()
+
+    hw = _manager(FakeRadio(ready=False))
+    hw._rc.next_due_batch.return_value = []
+    hw._rc.next_due_delay.return_value = None
+    with patch.object(lm, "_HARDWARE_AVAILABLE", False):
+        hw.start()
+    assert hw._thread._target == hw._radio_loop
+    hw.stop()
+
+
+def _run_radio_loop(mgr: LoRaManager, iterations: int) -> list[float]:
+    """Run _radio_loop for *iterations* receive waits; return their timeouts."""
+    timeouts = []
+
+    def receive(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) >= iterations:
+            mgr._running = False
+        return None
+
+    mgr._receive_burst = receive
+    mgr._running = True
+    mgr._radio_loop()
+    return timeouts
+
+
+def test_radio_loop_transmits_due_commands_before_listening():
+    radio = FakeRadio()
+    mgr = _manager(radio)
+    cmd = MagicMock(node_id=5, sequence_number=9, raw_packet=b"pkt",
+                    attempts=0)
+    mgr._rc.next_due_batch.side_effect = [[cmd], [], []]
+    mgr._rc.next_due_delay.return_value = None
+    _run_radio_loop(mgr, 2)
+    assert radio.sent == [(b"pkt", 5)]
+    mgr._rc.mark_sent.assert_called_once_with(9)
+
+
+def test_radio_loop_wait_bounded_by_next_retry():
+    mgr = _manager(FakeRadio())
+    mgr._rc.next_due_batch.return_value = []
+    mgr._rc.next_due_delay.return_value = 0.25
+    assert _run_radio_loop(mgr, 1) == [0.25]
+
+
+def test_radio_loop_purges_once_per_interval():
+    mgr = _manager(FakeRadio())
+    mgr._rc.next_due_batch.return_value = []
+    mgr._rc.next_due_delay.return_value = None
+    _run_radio_loop(mgr, 5)
+    assert mgr._rc.purge_completed.call_count == 1
+
+
+# ============================================================
+# Alert thresholds
+# ============================================================
+
+def _alerting_manager(node_cfg=None) -> LoRaManager:
+    mgr = LoRaManager(MagicMock(), MagicMock(), MagicMock(),
+                      alert_manager=MagicMock())
+    mgr._cfg.get_node.return_value = node_cfg or {}
+    return mgr
+
+
+def _pkt(values=(), battery=80) -> MultiSensorPacket:
+    return MultiSensorPacket(
+        sync_word=cfg.SYNC_MULTI_SENSOR, network_id=1,
+        packet_type=cfg.PACKET_MULTI_SENSOR, sensor_id=4,
+        battery_percent=battery, power_state=0, last_command_seq=0,
+        ack_status=0, location="", zone="",
+        values=[SensorValue(t, v) for t, v in values],
+    )
+
+
+def _alert_keys(mgr: LoRaManager) -> list[str]:
+    return [c.kwargs["key"] for c in mgr._alerts.send.call_args_list]
+
+
+def test_alerts_none_within_thresholds():
+    mgr = _alerting_manager()
+    mgr._check_alerts(_pkt([(cfg.VALUE_TEMPERATURE, 21.0),
+                            (cfg.VALUE_HUMIDITY, 99.0)]))
+    mgr._alerts.send.assert_not_called()
+
+
+def test_alerts_temperature_high_and_low():
+    mgr = _alerting_manager({"temp_thresh_high": 30.0,
+                             "temp_thresh_low": 5.0})
+    mgr._check_alerts(_pkt([(cfg.VALUE_TEMPERATURE, 31.0),
+                            (cfg.VALUE_TEMPERATURE, 4.0)]))
+    assert _alert_keys(mgr) == ["node_4_temp_high", "node_4_temp_low"]
+
+
+def test_alerts_threshold_ignores_other_value_types():
+    mgr = _alerting_manager()
+    mgr._check_alerts(_pkt([(cfg.VALUE_HUMIDITY, 500.0)]))
+    mgr._alerts.send.assert_not_called()
+
+
+def test_alerts_battery_levels():
+    mgr = _alerting_manager()
+    mgr._check_alerts(_pkt(battery=15))
+    mgr._check_alerts(_pkt(battery=5))
+    assert _alert_keys(mgr) == ["node_4_batt_low", "node_4_batt_critical"]
+
+
+def test_alert_thresholds_cached_until_node_change():
+    mgr = _alerting_manager({"temp_thresh_high": 30.0})
+    mgr._check_alerts(_pkt([(cfg.VALUE_TEMPERATURE, 25.0)]))
+    mgr._check_alerts(_pkt([(cfg.VALUE_TEMPERATURE, 25.0)]))
+    assert mgr._cfg.get_node.call_count == 1
+    listener = mgr._cfg.add_node_listener.call_args.args[0]
+    mgr._cfg.get_node.return_value = {"temp_thresh_high": 20.0}
+    listener()
+    mgr._check_alerts(_pkt([(cfg.VALUE_TEMPERATURE, 25.0)]))
+    assert mgr._cfg.get_node.call_count == 2
+    assert _alert_keys(mgr) == ["node_4_temp_high"]
+
+
+# ============================================================
+# Legacy packet dispatch
+# ============================================================
+
+def test_dispatch_legacy_publishes_multi_sensor():
+    mqtt = MagicMock()
+    mgr = LoRaManager(MagicMock(), MagicMock(), MagicMock(), mqtt_manager=mqtt)
+    raw = struct.pack("<HBHffBbf", cfg.SYNC_LEGACY, 6, 1, 20.5, 40.0, 77,
+                      -80, 6.0)
+    mgr._dispatch(raw, rssi=-80.0, snr=6.0)
+    mgr._store.ingest_legacy.assert_called_once()
+    mp = mqtt.publish_packet.call_args.args[0]
+    assert isinstance(mp, MultiSensorPacket)
+    assert mp.sensor_id == 6 and mp.packet_type == cfg.PACKET_LEGACY
+    assert mp.battery_percent == 77 and mp.rssi == -80.0
+    assert [(v.type, v.value) for v in mp.values] == [
+        (cfg.VALUE_TEMPERATURE, 20.5), (cfg.VALUE_HUMIDITY, 40.0)]
+
+
+# ============================================================
+# Time sync scheduling
+# ============================================================
+
+def test_time_sync_waits_for_deadline():
+    mgr = _manager()
+    mgr._maybe_send_time_sync()
+    mgr._rc.enqueue_time_sync.assert_not_called()
+
+
+def test_time_sync_single_broadcast_and_rearms():
+    mgr = _manager()
+    mgr._next_time_sync = time.monotonic() - 1
+    mgr._maybe_send_time_sync()
+    mgr._rc.enqueue_time_sync_broadcast.assert_called_once()
+    epoch, tz = mgr._rc.enqueue_time_sync_broadcast.call_args.args
+    assert abs(epoch - time.time()) < 5 and tz == 0
+    mgr._rc.enqueue_time_sync.assert_not_called()
+    assert mgr._next_time_sync > time.monotonic() + cfg.TIME_SYNC_INTERVAL - 5
+    mgr._maybe_send_time_sync()
+    assert mgr._rc.enqueue_time_sync_broadcast.call_count == 1
+
+
+# ============================================================
+# Log level guards
+# ============================================================
+
+class _HexSpy(bytes):
+    """bytes whose slices record whether .hex() was called."""
+    calls = 0
+
+    def __getitem__(self, item):
+        result = bytes.__getitem__(self, item)
+        return _HexSpy(result) if isinstance(item, slice) else result
+
+    def hex(self, *args):
+        _HexSpy.calls += 1
+        return bytes.hex(self, *args)
+
+
+def test_unrecognised_packet_hex_skipped_when_info_disabled():
+    mgr = _manager()
+    _HexSpy.calls = 0
+    with patch.object(lm.logger, "isEnabledFor", return_value=False):
+        mgr._dispatch(_HexSpy(b"\x00\x11\x22\x33"))
+    assert _HexSpy.calls == 0
+    with patch.object(lm.logger, "isEnabledFor", return_value=True):
+        mgr._dispatch(_HexSpy(b"\x00\x11\x22\x33"))
+    assert _HexSpy.calls == 1
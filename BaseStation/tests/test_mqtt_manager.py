@@ -0,0 +1,149 @@
+"""
+tests/test_mqtt_manager.py — Unit tests for mqtt_manager.py.
+
+The paho client is replaced by a MagicMock; no broker is needed.
+
+Tests cover:
+  - publish_packet: one retained JSON state message per packet
+  - publish_packet: per-value topics, on unless turned off
+  - Topic strings: per-node and per-value-type topics are prebuilt
+  - Value names: every uint8 type resolves, unknown ones as value_<type>
+  - Client setup: reconnect back-off and bounded paho queue
+  - Not connected: nothing is queued
+  - disconnect: drains queued messages before disconnecting
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lss_basestation import config as cfg
+from lss_basestation.mqtt_manager import MQTTManager
+from lss_basestation.packet_parser import MultiSensorPacket, SensorValue
+
+
+@pytest.fixture
+def mgr():
+    with patch.object(MQTTManager, "_init_client"):
+        m = MQTTManager("localhost", 1883, "", "", "lss/", enabled=True,
+                        per_value_topics=False)
+    m._client = MagicMock()
+    m._connected = True
+    yield m
+    m.disconnect()
+
+
+def _packet(**kw) -> MultiSensorPacket:
+    fields = dict(
+        sync_word=cfg.SYNC_MULTI_SENSOR, network_id=1,
+        packet_type=cfg.PACKET_MULTI_SENSOR, sensor_id=3,
+        battery_percent=87, power_state=1, last_command_seq=0,
+        ack_status=0, location="Lab", zone="Zone1",
+        values=[SensorValue(cfg.VALUE_TEMPERATURE, 22.5)],
+        rssi=-70.0, snr=9.25,
+    )
+    fields.update(kw)
+    return MultiSensorPacket(**fields)
+
+
+def _published(client: MagicMock) -> dict[str, str]:
+    return {c.args[0]: c.args[1] for c in client.publish.call_args_list}
+
+
+# ============================================================
+# Publishing
+# ============================================================
+
+def test_publish_packet_single_state_message(mgr):
+    client = mgr._client
+    mgr.publish_packet(_packet())
+    mgr.disconnect()
+    client.publish.assert_called_once()
+    call = client.publish.call_args
+    assert call.args[0] == "lss/3/state"
+    assert call.kwargs["retain"] is True
+    assert json.loads(call.args[1]) == {
+        "battery": 87, "power_state": 1, "rssi": -70.0, "snr": 9.25,
+        "values": {"temperature": 22.5},
+    }
+
+
+def test_publish_packet_state_omits_missing_link_quality(mgr):
+    client = mgr._client
+    mgr.publish_packet(_packet(rssi=None, snr=None))
+    mgr.disconnect()
+    state = json.loads(_published(client)["lss/3/state"])
+    assert "rssi" not in state and "snr" not in state
+
+
+def test_publish_packet_per_value_topics(mgr):
+    client = mgr._client
+    mgr._per_value_topics = True
+    mgr.publish_packet(_packet())
+    mgr.disconnect()
+    topics = _published(client)
+    assert "lss/3/state" in topics
+    assert topics["lss/3/battery"] == "87"
+    assert topics["lss/3/power_state"] == "1"
+    assert topics["lss/3/rssi"] == "-70.0"
+    assert topics["lss/3/snr"] == "9.25"
+    assert topics["lss/3/temperature"] == "22.5000"
+
+
+def test_per_value_topics_on_by_default():
+    with patch.object(MQTTManager, "_init_client"):
+        m = MQTTManager("localhost", 1883, "", "", "lss", enabled=False)
+    assert m._per_value_topics is True
+
+
+def test_topic_strings_cached(mgr):
+    first = mgr._node_topics(3)
+    assert first[0] == "lss/3/state" and first[5] == "lss/3/online"
+    assert mgr._node_topics(3) is first
+    assert mgr._value_topics[cfg.VALUE_HUMIDITY] % 3 == "lss/3/humidity"
+
+
+def test_per_value_topic_unknown_type(mgr):
+    client = mgr._client
+    mgr._per_value_topics = True
+    mgr.publish_packet(_packet(values=[SensorValue(200, 1.0)]))
+    mgr.disconnect()
+    assert _published(client)["lss/3/value_200"] == "1.0000"
+
+
+def test_client_tuning():
+    with patch("lss_basestation.mqtt_manager.mqtt.Client") as client_cls:
+        m = MQTTManager("localhost", 1883, "", "", "lss", enabled=True)
+    client = client_cls.return_value
+    client.reconnect_delay_set.assert_called_once_with(min_delay=1,
+                                                       max_delay=30)
+    client.max_queued_messages_set.assert_called_once_with(4096)
+    client.loop_start.assert_called_once()
+    m.disconnect()
+
+
+def test_state_value_keys_for_unknown_types(mgr):
+    client = mgr._client
+    mgr.publish_packet(_packet(values=[SensorValue(cfg.VALUE_HUMIDITY, 40.0),
+                                       SensorValue(250, 2.0)]))
+    mgr.disconnect()
+    state = json.loads(_published(client)["lss/3/state"])
+    assert state["values"] == {"humidity": 40.0, "value_250": 2.0}
+
+
+def test_not_connected_queues_nothing(mgr):
+    mgr._connected = False
+    mgr.publish_packet(_packet())
+    assert not mgr._queue
+    mgr.publish_online_status(3, True)
+    assert not mgr._queue
+
+
+def test_disconnect_drains_queue(mgr):
+    client = mgr._client
+    for nid in range(50):
+        mgr.publish_online_status(nid, True)
+    mgr.disconnect()
+    assert client.publish.call_count == 50
+    client.disconnect.assert_called_once()
@@ -2,15 +2,20 @@
 tests/test_packet_parser.py — Unit tests for packet_parser.py.
 
 Tests cover:
-  - CRC-16 known vectors
+  - CRC-16 known vectors and agreement with a bit-serial reference
+  - CRC-16 over a length-limited prefix
+  - CRC-16 vectors shared with the firmware test suite
   - Multi-sensor packet: encode → decode round-trip
+  - Multi-sensor packet: string fields end at the first NUL
   - Multi-sensor packet: checksum rejection
   - Multi-sensor packet: truncated input
+  - Parsed packets are slotted; sensor values are plain tuples
   - Command packet: encode → decode round-trip
   - ACK packet: build_ack → parse round-trip
   - Legacy packet: decode
-  - detect_packet_type: all sync words
-  - detect_packet_type: garbage input
+  - detect_packet_type: all sync words, garbage and short input
+  - parse_packet: same classification as detect_packet_type, one call
+  - Parsing from a memoryview of a reused buffer
 """
 
 import struct
@@ -25,6 +30,7 @@ from lss_basestation.packet_parser import (
     parse_ack,
     parse_legacy,
     detect_packet_type,
+    parse_packet,
     MultiSensorPacket,
     SensorValue,
 )
@@ -33,17 +39,40 @@ from lss_basestation.packet_parser import (
 # CRC-16 helpers
 # ============================================================
 
-def test_crc16_empty():
-    assert _crc16(b"") == 0xFFFF
-
-def test_crc16_known_vector():
-    # CRC-16/CCITT-FALSE of b"123456789" = 0x29B1
-    assert _crc16(b"123456789") == 0x29B1
-
-def test_crc16_single_byte():
-    # Regression: ensure single-byte input doesn't raise
-    result = _crc16(b"\x00")
-    assert isinstance(result, int)
+@pytest.mark.parametrize("data, expected", [
+    (b"", 0xFFFF),
+    (b"123456789", 0x29B1),     # CRC-16/CCITT-FALSE check value
+    (b"\x00", 0xE1F0),          # regression: single-byte input
+], ids=["empty", "check-vector", "single-byte"])
+def test_crc16_known_vectors(data, expected):
+    assert _crc16(data) == expected
+
+
+def _crc16_bitwise(data):
+    """Bit-serial reference implementation."""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        crc &= 0xFFFF
+    return crc
+
+def test_crc16_matches_bitwise_reference():
+    data = bytes((i * 37 + 11) & 0xFF for i in range(256))
+    for end in (1, 2, 58, 138, 198, 256):
+        assert _crc16(data[:end]) == _crc16_bitwise(data[:end])
+
+def test_crc16_shared_vectors():
+    # Same vectors as LSS-Arduino/test/test_packets (lss_crc16); a change on
+    # either side must keep both suites passing.
+    assert _crc16(b"\x00") == 0xE1F0
+    assert _crc16(bytes(range(256))) == 0x3FBD
+
+def test_crc16_length_prefix():
+    data = bytearray(b"123456789trailing")
+    assert _crc16(data, 9) == 0x29B1
+    assert _crc16(data, len(data)) == _crc16(bytes(data))
 
 # ============================================================
 # Multi-sensor packet round-trip
@@ -91,6 +120,16 @@ def test_multi_sensor_round_trip():
     assert pkt.snr == 7.5
 
 
+def test_multi_sensor_strings_stop_at_nul():
+    raw = bytearray(_make_multi_raw())
+    # Stale bytes after the terminator (e.g. from a shorter strncpy)
+    raw[12 + 7:12 + 10] = b"old"     # location starts at offset 12
+    payload_end = len(raw) - 2
+    struct.pack_into("<H", raw, payload_end, _crc16(bytes(raw[:payload_end])))
+    pkt = parse_multi_sensor(bytes(raw))
+    assert pkt.location == "Garage"
+
+
 def test_multi_sensor_bad_crc():
     raw = _make_multi_raw(corrupt_crc=True)
     assert parse_multi_sensor(raw) is None
@@ -115,6 +154,14 @@ def test_multi_sensor_max_values():
     pkt = parse_multi_sensor(raw)
     assert pkt is not None
     assert len(pkt.values) == 16
+    assert [v.type for v in pkt.values] == list(range(16))
+    assert abs(pkt.values[15].value - 16.5) < 0.001
+
+
+def test_multi_sensor_no_values():
+    pkt = parse_multi_sensor(_make_multi_raw(values=[]))
+    assert pkt is not None
+    assert pkt.values == []
 
 
 def test_multi_sensor_no_rssi():
@@ -124,6 +171,24 @@ def test_multi_sensor_no_rssi():
     assert pkt.rssi is None
     assert pkt.snr is None
 
+def test_sensor_value_name_and_unit():
+    sv = SensorValue(cfg.VALUE_HUMIDITY, 40.0)
+    assert sv.name == "humidity"
+    assert sv.unit == "%RH"
+    unknown = SensorValue(200, 1.0)
+    assert unknown.name == "type_200"
+    assert unknown.unit == ""
+
+
+def test_parsed_packets_are_compact():
+    pkt = parse_multi_sensor(_make_multi_raw())
+    assert not hasattr(pkt, "__dict__")
+    assert type(pkt.values[0]) is SensorValue
+    assert pkt.values[1].name == "humidity"
+    assert pkt.values[0] == (cfg.VALUE_TEMPERATURE, pkt.values[0].value)
+    vtype, value = pkt.values[1]
+    assert vtype == cfg.VALUE_HUMIDITY and abs(value - 55.0) < 0.001
+
 # ============================================================
 # Command packet round-trip
 # ============================================================
@@ -183,6 +248,11 @@ def test_nack_round_trip():
     assert pkt is not None
     assert pkt.command_type == cfg.CMD_NACK
 
+def test_ack_wrong_sync():
+    raw = bytearray(build_command(cfg.CMD_ACK, 1, 0))
+    struct.pack_into("<H", raw, 0, cfg.SYNC_MULTI_SENSOR)
+    assert parse_ack(bytes(raw)) is None
+
 # ============================================================
 # Legacy packet
 # ============================================================
@@ -224,29 +294,56 @@ def test_legacy_too_short():
 # detect_packet_type
 # ============================================================
 
-def test_detect_multi_sensor():
-    raw = _make_multi_raw()
-    assert detect_packet_type(raw) == cfg.PACKET_MULTI_SENSOR
-
-
-def test_detect_legacy():
-    raw = _make_legacy_raw()
-    assert detect_packet_type(raw) == cfg.PACKET_LEGACY
-
+@pytest.mark.parametrize("raw_fn, expected", [
+    (_make_multi_raw, cfg.PACKET_MULTI_SENSOR),
+    (_make_legacy_raw, cfg.PACKET_LEGACY),
+    (lambda: build_command(cfg.CMD_PING, 1, 0), cfg.PACKET_CONFIG),
+    (lambda: build_command(cfg.CMD_ACK, 1, 0), cfg.PACKET_ACK),
+    (lambda: b"\x00\x01\x02\x03", None),
+    (lambda: b"\xCD", None),             # too short for a sync word
+], ids=["multi-sensor", "legacy", "command", "ack", "garbage", "too-short"])
+def test_detect_packet_type(raw_fn, expected):
+    assert detect_packet_type(raw_fn()) == expected
 
-def test_detect_command():
-    raw = build_command(cfg.CMD_PING, 1, 0)
-    assert detect_packet_type(raw) == cfg.PACKET_CONFIG
-
-
-def test_detect_ack():
-    raw = build_command(cfg.CMD_ACK, 1, 0)
-    assert detect_packet_type(raw) == cfg.PACKET_ACK
 
+# ============================================================
+# parse_packet (detect + parse in one call)
+# ============================================================
 
-def test_detect_garbage():
-    assert detect_packet_type(b"\x00\x01\x02\x03") is None
+def test_parse_packet_matches_detect_and_parse():
+    frames = [
+        (_make_multi_raw(), MultiSensorPacket),
+        (_make_legacy_raw(), None),
+        (build_command(cfg.CMD_NACK, 2, 9), None),
+        (build_command(cfg.CMD_PING, 1, 0), None),
+    ]
+    for raw, cls in frames:
+        ptype, pkt = parse_packet(raw, rssi=-70.0, snr=5.0)
+        assert ptype == detect_packet_type(raw)
+        assert pkt is not None
+        if cls:
+            assert isinstance(pkt, cls) and pkt.rssi == -70.0
+    assert parse_packet(build_command(cfg.CMD_ACK, 3, 7))[1].sequence_number == 7
+
+
+def test_parse_packet_unrecognised_vs_invalid():
+    assert parse_packet(b"\x00\x01\x02\x03") == (None, None)
+    assert parse_packet(b"\xCD") == (None, None)
+    bad = _make_multi_raw(corrupt_crc=True)
+    assert parse_packet(bad) == (cfg.PACKET_MULTI_SENSOR, None)
 
+# ============================================================
+# Zero-copy input
+# ============================================================
 
-def test_detect_too_short():
-    assert detect_packet_type(b"\xCD") is None
+def test_parse_from_reused_buffer_view():
+    buf = bytearray(256)
+    raw = _make_multi_raw()
+    buf[:len(raw)] = raw
+    view = memoryview(buf)[:len(raw)]
+    assert detect_packet_type(view) == cfg.PACKET_MULTI_SENSOR
+    pkt = parse_multi_sensor(view)
+    assert pkt is not None
+    buf[:] = bytes(256)          # next packet overwrites the buffer
+    assert pkt.location == "Garage"
+    assert abs(pkt.values[0].value - 22.5) < 0.001
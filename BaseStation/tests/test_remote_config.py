@@ -4,15 +4,22 @@ tests/test_remote_config.py — Unit tests for remote_config.py.
 Tests cover:
   - Enqueue adds a command and returns a sequence number
   - next_due returns the first un-attempted command
+  - next_due_batch returns every due command in queue order
   - mark_sent increments attempt counter
   - Retry: command is re-due after COMMAND_RETRY_TIMEOUT
+  - Retry timing is unaffected by wall-clock steps
   - Retry exhaustion: command is marked failed after COMMAND_RETRY_COUNT
   - process_ack clears the pending entry on success
   - process_ack marks failed on NACK
   - process_piggyback_ack handles both success and failure
   - all_pending returns only active commands
   - purge_completed removes acked/failed entries
+  - Completed commands leave the active queue; repeated ACKs fire once
+  - ACK lookup by sequence number survives purge and wrap-around
   - Command factory helpers produce correct payloads
+  - raw_packet is serialised once and reused for retries
+  - Time-sync broadcast: addressed to NODE_ID_BROADCAST, done after one send
+  - Enqueue callback fires per command; next_due_delay tracks retries
 """
 
 import struct
@@ -67,6 +74,15 @@ def test_retry_after_timeout(rc, monkeypatch):
     assert cmd.sequence_number == seq
 
 
+def test_retry_timing_ignores_wall_clock_steps(rc, monkeypatch):
+    seq = rc.enqueue(1, cfg.CMD_PING)
+    rc.mark_sent(seq)
+    wall = time.time()
+    monkeypatch.setattr(time, "time", lambda: wall + 3600)   # NTP step
+    assert rc.next_due() is None
+    assert 0 < rc.next_due_delay() <= cfg.COMMAND_RETRY_TIMEOUT
+
+
 def test_retry_exhaustion(rc, monkeypatch):
     monkeypatch.setattr(cfg, "COMMAND_RETRY_TIMEOUT", 0)
     monkeypatch.setattr(cfg, "COMMAND_RETRY_COUNT", 2)
@@ -85,6 +101,14 @@ def test_retry_exhaustion(rc, monkeypatch):
     assert entry.failed is True
 
 
+def test_next_due_batch_returns_all_due(rc):
+    seqs = [rc.enqueue(n, cfg.CMD_PING) for n in (1, 2, 3)]
+    assert [c.sequence_number for c in rc.next_due_batch()] == seqs
+    assert len(rc.next_due_batch(max_n=2)) == 2
+    rc.mark_sent(seqs[1])
+    assert [c.sequence_number for c in rc.next_due_batch()] == [seqs[0], seqs[2]]
+
+
 def test_process_ack_clears(rc):
     seq = rc.enqueue(3, cfg.CMD_SET_INTERVAL)
     found = rc.process_ack(3, seq, success=True)
@@ -152,9 +176,20 @@ def test_all_pending_excludes_acked(rc):
 def test_purge_completed(rc):
     seq = rc.enqueue(1, cfg.CMD_PING)
     rc.process_ack(1, seq, success=True)
+    assert rc._active == []            # leaves the active queue at once
     removed = rc.purge_completed()
     assert removed == 1
-    assert len(rc._queue) == 0
+    assert rc._done == []
+
+
+def test_repeated_piggyback_ack_fires_once(rc):
+    results = []
+    rc.set_result_callback(lambda *args: results.append(args))
+    seq = rc.enqueue(2, cfg.CMD_PING)
+    # Nodes repeat lastCommandSeq in every telemetry packet.
+    rc.process_piggyback_ack(2, seq, 0)
+    rc.process_piggyback_ack(2, seq, 0)
+    assert len(results) == 1
 
 
 def test_enqueue_set_interval_payload(rc):
@@ -174,6 +209,20 @@ def test_enqueue_set_location_payload(rc):
     assert b"Zone2" in e.data
 
 
+def test_enqueue_threshold_and_radio_payloads(rc):
+    cases = [
+        (rc.enqueue_set_temp_thresh(1, -5.0, 40.0), "<ff", (-5.0, 40.0)),
+        (rc.enqueue_set_battery_thresh(1, 20.0, 10.0), "<ff", (20.0, 10.0)),
+        (rc.enqueue_set_lora_params(1, 915.0, 9, 125, 17), "<fBBB",
+         (915.0, 9, 0, 17)),
+        (rc.enqueue_set_mesh_config(1, True), "<B", (1,)),
+    ]
+    for seq, fmt, expected in cases:
+        with rc._lock:
+            e = rc._find_locked(seq)
+        assert struct.unpack(fmt, e.data) == expected
+
+
 def test_enqueue_time_sync_payload(rc):
     epoch = 1700000000
     tz = -300
@@ -185,6 +234,34 @@ def test_enqueue_time_sync_payload(rc):
     assert tz_r == tz
 
 
+def test_time_sync_broadcast_sent_once(rc):
+    seq = rc.enqueue_time_sync_broadcast(1700000000, 0)
+    cmd = rc.next_due()
+    assert cmd.sequence_number == seq
+    assert cmd.node_id == cfg.NODE_ID_BROADCAST
+    assert cmd.command_type == cfg.CMD_TIME_SYNC
+    rc.mark_sent(seq)
+    assert rc.next_due() is None
+    assert rc.purge_completed() == 1
+
+
+def test_raw_packet_built_once(rc, monkeypatch):
+    from lss_basestation import remote_config
+    from lss_basestation.packet_parser import parse_command
+    calls = []
+    real_build = remote_config.build_command
+    monkeypatch.setattr(remote_config, "build_command",
+                        lambda *a: calls.append(a) or real_build(*a))
+    seq = rc.enqueue_set_interval(4, 30000)
+    cmd = rc.next_due()
+    first = cmd.raw_packet
+    assert cmd.raw_packet is first           # retries reuse the same frame
+    assert len(calls) == 1
+    pkt = parse_command(first)
+    assert (pkt.target_sensor_id, pkt.sequence_number) == (4, seq)
+    assert not hasattr(cmd, "__dict__")      # slotted
+
+
 def test_result_callback_on_ack(rc):
     results = []
     rc.set_result_callback(
@@ -195,6 +272,17 @@ def test_result_callback_on_ack(rc):
     assert results == [(5, True)]
 
 
+def test_ack_lookup_after_purge_and_wrap(rc):
+    old = rc.enqueue(1, cfg.CMD_PING)
+    rc.process_ack(1, old, success=True)
+    rc._seq = old                      # next enqueue reuses the number
+    new = rc.enqueue(2, cfg.CMD_PING)
+    assert new == old
+    assert rc.purge_completed() == 1
+    assert rc.process_ack(2, new, success=True)
+    assert rc.all_pending() == []
+
+
 def test_sequence_wraps_at_255(rc):
     rc._seq = 254
     s1 = rc.enqueue(1, cfg.CMD_PING)
@@ -203,3 +291,33 @@ def test_sequence_wraps_at_255(rc):
     assert s2 == 255
     s3 = rc.enqueue(1, cfg.CMD_PING)
     assert s3 == 0  # wraps
+
+
+# ============================================================
+# Enqueue callback / next_due_delay
+# ============================================================
+
+def test_enqueue_callback_fires(rc):
+    calls = []
+    rc.set_enqueue_callback(lambda: calls.append(1))
+    rc.enqueue(1, cfg.CMD_PING)
+    rc.enqueue_time_sync_broadcast(1700000000, 0)
+    assert len(calls) == 2
+
+
+def test_next_due_delay_idle(rc):
+    assert rc.next_due_delay() is None
+
+
+def test_next_due_delay_new_command(rc):
+    rc.enqueue(1, cfg.CMD_PING)
+    assert rc.next_due_delay() == 0.0
+
+
+def test_next_due_delay_waits_for_retry(rc):
+    seq = rc.enqueue(1, cfg.CMD_PING)
+    rc.mark_sent(seq)
+    delay = rc.next_due_delay()
+    assert 0 < delay <= cfg.COMMAND_RETRY_TIMEOUT
+    rc.process_ack(1, seq, success=True)
+    assert rc.next_due_delay() is None
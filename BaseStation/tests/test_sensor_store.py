@@ -4,10 +4,18 @@ tests/test_sensor_store.py — Unit tests for sensor_store.py.
 Tests cover:
   - Ingesting a multi-sensor packet updates in-memory state
   - State transitions: online after ingest, offline after timeout
+  - Watchdog sleeps until the earliest deadline and skips stale ones
   - History eviction (ring buffer at MAX_HISTORY_POINTS)
   - SQLite round-trip: persisted rows are queryable
+  - History field selection, bucketed averages and the covering index
+  - History reads use pooled read-only connections, not the writer's
+  - History rows are buffered and written in batches; close() flushes
+  - A full history queue drops the oldest rows and counts them
+  - SQLite connection PRAGMAs
   - get_node returns None for unknown nodes
-  - MAX_NODES cap
+  - Snapshots are immutable, detached from live state, cached until change
+  - version changes on ingest and on offline transitions
+  - MAX_NODES cap, including under concurrent ingestion
 """
 
 import time
@@ -19,6 +27,7 @@ import pytest
 
 from lss_basestation import config as cfg
 from lss_basestation.packet_parser import MultiSensorPacket, SensorValue
+from lss_basestation import sensor_store
 from lss_basestation.sensor_store import SensorStore
 
 
@@ -46,8 +55,11 @@ def _make_packet(sensor_id=1, temp=20.0, hum=50.0, battery=80, rssi=-75.0, snr=9
 @pytest.fixture
 def store(tmp_path):
     db = str(tmp_path / "test.db")
-    s = SensorStore(db_path=db)
+    # Watchdog tests schedule deadlines and drive _mark_offline() directly;
+    # the one that needs the real thread starts it itself.
+    s = SensorStore(db_path=db, start_watchdog=False)
     yield s
+    s.close()
 
 
 # ============================================================
@@ -70,6 +82,24 @@ def test_ingest_updates_values(store):
     assert node.rssi == -75.0
 
 
+def test_history_ring_evicts_oldest(store, monkeypatch):
+    monkeypatch.setattr(cfg, "MAX_HISTORY_POINTS", 3)
+    for batt in range(10, 15):
+        store.ingest_multi_sensor(_make_packet(sensor_id=5, battery=batt))
+    with store._shard_for(5):
+        samples = store._nodes[5].history.samples()
+    assert [s[1] for s in samples] == [12, 13, 14]
+    assert samples[0][0] <= samples[-1][0]
+    assert samples[-1][2:] == (-75.0, 9.0)
+
+
+def test_history_ring_missing_rssi():
+    ring = sensor_store.HistoryRing(size=2)
+    ring.append(1.0, 50, None, None)
+    assert len(ring) == 1
+    assert ring.samples() == [(1.0, 50, None, None)]
+
+
 def test_ingest_marks_online(store):
     pkt = _make_packet()
     store.ingest_multi_sensor(pkt)
@@ -88,6 +118,43 @@ def test_get_all_nodes(store):
     assert len(nodes) == 3
 
 
+def test_snapshot_is_detached(store):
+    store.ingest_multi_sensor(_make_packet(sensor_id=4, temp=21.0))
+    snap = store.get_node(4)
+    store.ingest_multi_sensor(_make_packet(sensor_id=4, temp=35.0))
+    assert abs(snap.values[cfg.VALUE_TEMPERATURE] - 21.0) < 0.001
+    with pytest.raises(AttributeError):
+        snap.online = False
+
+
+def test_snapshot_reused_until_change(store):
+    store._watchdog_enabled = True
+    store.ingest_multi_sensor(_make_packet(sensor_id=4))
+    assert not hasattr(store._nodes[4], "__dict__")   # NodeState is slotted
+    snap = store.get_node(4)
+    assert store.get_node(4) is snap
+    assert store.get_all_nodes()[0] is snap
+    with pytest.raises(TypeError):
+        snap.values[cfg.VALUE_TEMPERATURE] = 0.0     # shared: read-only
+    store.ingest_multi_sensor(_make_packet(sensor_id=4))
+    assert store.get_node(4) is not snap
+    snap = store.get_node(4)
+    store._mark_offline(time.time() + cfg.NODE_OFFLINE_TIMEOUT + 1)
+    assert store.get_node(4).online is False
+
+
+def test_version_tracks_state_changes(store):
+    store._watchdog_enabled = True
+    v0 = store.version
+    store.ingest_multi_sensor(_make_packet(sensor_id=4))
+    v1 = store.version
+    assert v1 != v0
+    store._mark_offline(time.time())          # still fresh: no change
+    assert store.version == v1
+    store._mark_offline(time.time() + cfg.NODE_OFFLINE_TIMEOUT + 1)
+    assert store.version != v1
+
+
 def test_node_location_and_zone(store):
     pkt = _make_packet(sensor_id=2)
     pkt.location = "Roof"
@@ -113,6 +180,49 @@ def test_history_multiple_rows(store):
     assert len(rows) == 5
 
 
+def test_history_fields_subset(store):
+    store.ingest_multi_sensor(_make_packet(sensor_id=6, battery=55))
+    rows = store.get_history(6, fields=["battery_percent", "rssi"])
+    assert rows == [{"timestamp": rows[0]["timestamp"],
+                     "battery_percent": 55, "rssi": -75.0}]
+
+
+def test_history_buckets_average(store, monkeypatch):
+    clock = iter([1000.0, 1005.0, 1010.0, 1065.0])
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    for temp, batt in ((10.0, 80), (20.0, 60), (30.0, 70), (40.0, 50)):
+        store.ingest_multi_sensor(_make_packet(sensor_id=6, temp=temp,
+                                               battery=batt))
+    monkeypatch.undo()
+    rows = store.get_history(6, bucket_seconds=60)
+    assert [r["timestamp"] for r in rows] == [960, 1020]
+    assert rows[0]["battery_percent"] == 70
+    assert rows[1]["battery_percent"] == 50
+    temp = str(cfg.VALUE_TEMPERATURE)
+    assert abs(rows[0]["values"][temp] - 20.0) < 0.001
+    assert abs(rows[1]["values"][temp] - 40.0) < 0.001
+    assert store.get_history(6, bucket_seconds=60, limit=1)[0]["timestamp"] == 960
+
+
+def test_history_reads_do_not_wait_for_writer(store):
+    store.ingest_multi_sensor(_make_packet(sensor_id=6))
+    store.flush()
+    with store._db_lock:                  # writer busy
+        rows = store.get_history(6)
+    assert len(rows) == 1
+    conn = store._readers.get_nowait()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM sensor_history")
+
+
+def test_history_metrics_use_covering_index(store):
+    plan = store._db.execute(
+        "EXPLAIN QUERY PLAN SELECT timestamp, battery_percent, rssi, snr "
+        "FROM sensor_history WHERE node_id = 1 AND timestamp >= 0"
+    ).fetchall()
+    assert "COVERING INDEX idx_node_ts_metrics" in str(plan)
+
+
 def test_history_limit(store):
     for i in range(10):
         store.ingest_multi_sensor(_make_packet(sensor_id=7, temp=float(i)))
@@ -120,16 +230,66 @@ def test_history_limit(store):
     assert len(rows) == 3
 
 
-def test_history_since_filter(store):
+def test_history_since_filter(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
     store.ingest_multi_sensor(_make_packet(sensor_id=8))
-    checkpoint = time.time()
-    time.sleep(0.01)
+    checkpoint = 1000.5
+    now[0] = 1001.0
     store.ingest_multi_sensor(_make_packet(sensor_id=8, temp=99.0))
     rows = store.get_history(8, since=checkpoint)
     assert len(rows) == 1
     assert abs(rows[0]["values"][str(cfg.VALUE_TEMPERATURE)] - 99.0) < 0.001
 
 
+def test_history_rows_are_batched(tmp_path, monkeypatch):
+    monkeypatch.setattr(sensor_store, "_HISTORY_FLUSH_INTERVAL", 60)
+    store = SensorStore(db_path=str(tmp_path / "batch.db"))
+    for i in range(3):
+        store.ingest_multi_sensor(_make_packet(sensor_id=9, temp=float(i)))
+    assert len(store._pending) == 3          # buffered, not yet written
+    store.flush()
+    assert not store._pending
+    conn = sqlite3.connect(store._db_path)
+    count, = conn.execute(
+        "SELECT COUNT(*) FROM sensor_history WHERE node_id = 9").fetchone()
+    conn.close()
+    assert count == 3
+    store.close()
+
+
+def test_history_queue_drops_oldest_when_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(sensor_store, "_HISTORY_QUEUE_MAX", 3)
+    monkeypatch.setattr(sensor_store, "_HISTORY_FLUSH_INTERVAL", 60)
+    monkeypatch.setattr(sensor_store, "_HISTORY_BATCH", 100)
+    s = SensorStore(db_path=str(tmp_path / "q.db"))
+    try:
+        for batt in range(5):
+            s.ingest_multi_sensor(_make_packet(sensor_id=9, battery=batt))
+        assert s.history_dropped == 2
+        assert [r["battery_percent"] for r in s.get_history(9)] == [2, 3, 4]
+    finally:
+        s.close()
+
+
+def test_db_tuned_for_batched_writes(store):
+    db = store._db
+    assert db.isolation_level is None
+    assert db.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert db.execute("PRAGMA synchronous").fetchone() == (1,)   # NORMAL
+    assert db.execute("PRAGMA temp_store").fetchone() == (2,)    # MEMORY
+
+
+def test_close_flushes_pending_rows(tmp_path):
+    db = str(tmp_path / "close.db")
+    s = SensorStore(db_path=db)
+    s.ingest_multi_sensor(_make_packet(sensor_id=3))
+    s.close()
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM sensor_history").fetchone() == (1,)
+    conn.close()
+
+
 def test_history_unknown_node(store):
     assert store.get_history(99) == []
 
@@ -150,23 +310,54 @@ def test_max_nodes_cap(store, monkeypatch):
     assert store.node_count() <= 3
 
 
-def test_watchdog_marks_offline(store, monkeypatch):
+def test_concurrent_ingest_respects_max_nodes(store, monkeypatch):
+    import threading
+    monkeypatch.setattr(cfg, "MAX_NODES", 10)
+    threads = [
+        threading.Thread(target=store.ingest_multi_sensor,
+                         args=(_make_packet(sensor_id=i),))
+        for i in range(1, 41)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.node_count() == 10
+    assert len(store.get_all_nodes()) == 10
+
+
+def test_watchdog_marks_offline(store):
     """Nodes idle longer than NODE_OFFLINE_TIMEOUT should be marked offline."""
-    monkeypatch.setattr(cfg, "NODE_OFFLINE_TIMEOUT", 0)  # Instant timeout
+    store._watchdog_enabled = True              # schedule, but no thread
     store.ingest_multi_sensor(_make_packet(sensor_id=10))
     node = store.get_node(10)
     assert node.online is True
-    # Simulate watchdog run
-    time.sleep(0.05)
-    store._watchdog_loop.__func__  # ensure it's accessible (it's a bound method)
-    # Directly mutate last_seen to force timeout
-    with store._lock:
-        store._nodes[10].last_seen = 0.0
-    # Run watchdog tick inline
-    import threading
-    now = time.time()
-    with store._lock:
-        for n in store._nodes.values():
-            if n.online and (now - n.last_seen) > cfg.NODE_OFFLINE_TIMEOUT:
-                n.online = False
+    # Run one watchdog pass as if the timeout had elapsed.
+    store._mark_offline(time.time() + cfg.NODE_OFFLINE_TIMEOUT + 1)
     assert store.get_node(10).online is False
+
+
+def test_watchdog_skips_stale_deadlines(store):
+    store._watchdog_enabled = True
+    store.ingest_multi_sensor(_make_packet(sensor_id=10))
+    first_deadline = store._timeouts[0][0]
+    with store._shard_for(10):
+        store._nodes[10].last_seen += 60          # heard from again later
+    store._mark_offline(first_deadline + 1)
+    assert store.get_node(10).online is True
+
+
+def test_no_deadlines_queued_without_watchdog(store):
+    for _ in range(5):
+        store.ingest_multi_sensor(_make_packet(sensor_id=12))
+    assert store._timeouts == []
+
+
+def test_watchdog_thread_wakes_on_deadline(store, monkeypatch):
+    monkeypatch.setattr(cfg, "NODE_OFFLINE_TIMEOUT", 0.05)
+    store._start_watchdog()
+    store.ingest_multi_sensor(_make_packet(sensor_id=11))
+    deadline = time.time() + 2
+    while store.get_node(11).online and time.time() < deadline:
+        time.sleep(0.01)
+    assert store.get_node(11).online is False
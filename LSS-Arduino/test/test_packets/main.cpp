@@ -39,6 +39,16 @@ void test_crc16_single_zero(void) {
     TEST_ASSERT_NOT_EQUAL(0, crc);  // Just check it runs without crash
 }
 
+void test_crc16_shared_vectors(void) {
+    // Same vectors as BaseStation/tests/test_packet_parser.py; a change on
+    // either side must keep both suites passing.
+    const uint8_t zero = 0x00;
+    TEST_ASSERT_EQUAL_HEX16(0xE1F0, lss_crc16(&zero, 1));
+    uint8_t ramp[256];
+    for (int i = 0; i < 256; i++) ramp[i] = (uint8_t)i;
+    TEST_ASSERT_EQUAL_HEX16(0x3FBD, lss_crc16(ramp, sizeof(ramp)));
+}
+
 // ============================================================
 // MultiSensorPacket round-trip
 // ============================================================
@@ -268,6 +278,7 @@ int main(void) {
     RUN_TEST(test_crc16_empty);
     RUN_TEST(test_crc16_known_vector);
     RUN_TEST(test_crc16_single_zero);
+    RUN_TEST(test_crc16_shared_vectors);
 
     RUN_TEST(test_multi_sensor_round_trip);
     RUN_TEST(test_multi_sensor_bad_crc);